@@ -1,7 +1,11 @@
+import json
+
 import streamlit as st
-import bcrypt
+import streamlit.components.v1 as components
 from typing import Dict, Any
 
+from core import auth
+
 # =============== PUSLAPIO NUSTATYMAI + TEMA ===============
 st.set_page_config(
     page_title="Sutarčių likučių skydelis",
@@ -67,20 +71,9 @@ def read_secrets() -> Dict[str, Any]:
         st.error("❌ Bent vienas 'password' nėra bcrypt hash. Turi prasidėti $2a$, $2b$ arba $2y$.")
         st.stop()
 
-    # username -> {name, hash, role}
-    usermap: Dict[str, Dict[str, str]] = {}
-    for i, u in enumerate(users):
-        usermap[u] = {
-            "name": str(names[i]).strip(),
-            "hash": str(passwords[i]).strip(),  # NUVALOM TARPUKUS
-            "role": str(roles[i]).strip(),
-        }
-
-    cookie_info = {
-        "cookie_name": auth_conf.get("cookie_name", "sutartys_login"),
-        "cookie_key": auth_conf.get("cookie_key", ""),
-        "cookie_expiry_days": int(auth_conf.get("cookie_expiry_days", 7)),
-    }
+    # username -> {name, hash, role} (tas pats žemėlapis, kurį naudoja ir puslapių vartai)
+    usermap: Dict[str, Dict[str, str]] = auth.users_from_secrets(creds)
+    cookie_info = auth.cookie_settings(auth_conf)
     if not cookie_info["cookie_key"] or len(cookie_info["cookie_key"]) < 32:
         st.warning("⚠️ Secrets [auth].cookie_key turėtų būti ilga atsitiktinė frazė (≥ 32 simbolių).")
 
@@ -89,30 +82,47 @@ def read_secrets() -> Dict[str, Any]:
 SECRETS = read_secrets()
 
 # =============== AUTH (BCRYPT + SESIJA) ===============
-def verify(username: str, password: str) -> bool:
+def verify(username: str, password: str) -> tuple[bool, str | None]:
+    """bcrypt – ribotame telkinyje, su bandymų ribojimu ir perhash'inimu (žr. core.auth)."""
     user = SECRETS["users"].get(username)
-    if not user:
-        return False
-    hashed = user["hash"].strip()
-    try:
-        return bcrypt.checkpw(password.encode("utf-8"), hashed.encode("utf-8"))
-    except Exception:
-        return False
+    return auth.authenticate(
+        username, password,
+        user["hash"].strip() if user else None,
+        getattr(st.context, "ip_address", None),
+        rounds=SECRETS["auth"]["bcrypt_rounds"],
+    )
 
 def is_logged_in() -> bool:
-    return st.session_state.get("auth_user") is not None
+    return auth.current_user() is not None
 
-def do_login(username: str):
+def do_login(username: str, remember: bool = True):
     u = SECRETS["users"][username]
-    st.session_state["auth_user"] = username
-    st.session_state["auth_name"] = u["name"]
-    st.session_state["auth_role"] = u["role"]
+    auth.start_session(username, u)
+    if remember and SECRETS["auth"]["cookie_key"]:
+        # Slapukas įrašomas kitame perpiešime (sync_cookie) – po prisijungimo iškart darom rerun
+        st.session_state["auth_cookie_pending"] = auth.make_token(
+            username, u["hash"], SECRETS["auth"]["cookie_key"], SECRETS["auth"]["cookie_expiry_days"])
 
 def logout():
     for k in ("auth_user", "auth_name", "auth_role"):
         st.session_state.pop(k, None)
+    # Sesijos slapukai (st.context.cookies) užfiksuoti jai prasidedant – šioje sesijoje nebeatkuriam
+    st.session_state["auth_logged_out"] = True
+    st.session_state["auth_cookie_pending"] = ""
     _rerun()
 
+# =============== PRISIJUNGIMO SLAPUKAS (pasirašytas žetonas, be bcrypt) ===============
+def sync_cookie():
+    """Įrašo (ar ištrina – tuščias žetonas) laukiantį slapuką naršyklėje; Streamlit slapukų rašymo API neturi."""
+    token = st.session_state.pop("auth_cookie_pending", None)
+    if token is None:
+        return
+    conf = SECRETS["auth"]
+    max_age = conf["cookie_expiry_days"] * 86400 if token else 0
+    secure = "; Secure" if str(st.context.url or "").startswith("https") else ""
+    cookie = f"{conf['cookie_name']}={token}; Max-Age={max_age}; Path=/; SameSite=Strict{secure}"
+    components.html(f"<script>window.parent.document.cookie = {json.dumps(cookie)};</script>", height=0)
+
 # =============== LOGIN EKRANAS ===============
 def login_view():
     st.markdown("<h2 style='text-align:center;'>Sutarčių likučių skydelis</h2>", unsafe_allow_html=True)
@@ -127,12 +137,13 @@ def login_view():
         if not username or not password:
             st.error("Įvesk vartotojo vardą ir slaptažodį.")
             st.stop()
-        if verify(username, password):
+        ok, problem = verify(username, password)
+        if ok:
             do_login(username)
             st.success("Prisijungta. Kraunama...")
             _rerun()
         else:
-            st.error("Neteisingas vartotojo vardas arba slaptažodis.")
+            st.error(problem or "Neteisingas vartotojo vardas arba slaptažodis.")
             st.stop()
 
     # Sustabdom, kad niekas nepraslystų žemyn
@@ -174,6 +185,8 @@ def page_admin():
     st.info("Pavyzdinis admin blokas – čia daryk konfigūraciją ir pan.")
 
 # =============== VYKDYMAS ===============
+auth.restore_session(SECRETS["users"], SECRETS["auth"])
+sync_cookie()
 if not is_logged_in():
     login_view()
 
@@ -207,7 +220,7 @@ st.caption("Be PVM, 2 skaičiai po kablelio (nukirpimas), kreditinės su „−
 st.markdown(
     """
 **Skyriai kairėje:**
-1. 📥 **Įkėlimas** – įkelk *Sąskaitos.xlsx* ir *Kreditines.xlsx* (tavo stulpelių struktūra).
+1. 📥 **Įkėlimas** – įkelk *Sąskaitos.xlsx* ir *Kreditines.xlsx* (tavo stulpelių struktūra; galima po kelis failus ir lapus).
 2. 🧾 **Likučiai ir planai** – ranka įvesk *Sutarties planą* ir gauk *Likutį*.
 3. 📈 **MoM / WoW kiekiai** – dokumentų kiekio dinamika per mėnesius/savaites (su slankiu vidurkiu).
 """
@@ -0,0 +1 @@
+"""Bendri (visų puslapių) duomenų sluoksnio moduliai."""
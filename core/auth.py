@@ -0,0 +1,322 @@
+"""
+Prisijungimo slaptažodžių tikrinimas: bcrypt – ribotame gijų telkinyje (ne skripto gijoje),
+su bandymų ribojimu pagal vartotoją ir IP (atskiros ribos) bei perhash'inimu į nustatytą kainą (cost).
+
+bcrypt.checkpw kaina auga dvigubai su kiekvienu cost vienetu (12 ≈ 0,2–0,3 s CPU). Kad rytinis
+prisijungimų antplūdis neužimtų viso serverio: vienu metu tikrinama ne daugiau BCRYPT_WORKERS
+slaptažodžių, laukiančiųjų eilė ribota (perpildžius – „bandyk vėliau“), o užblokuoti
+vartotojai/IP bcrypt iš viso nepasiekia.
+
+Hash'ai Secrets'e nekeičiami (jie tik skaitomi) – perhash'inti laikomi <DATA_DIR>/auth.sqlite
+kartu su Secrets hash'u, iš kurio gauti: pakeitus slaptažodį Secrets'e, senas įrašas nebegalioja.
+
+Sesijos žetonai (slapukui): pasirašyti HMAC-SHA256 su [auth].cookie_key ir su galiojimo laiku –
+naujas skirtukas ar persijungimas prisijungimą atkuria vienu HMAC patikrinimu, be bcrypt.
+
+Puslapių vartai (require_login): rinkiniai ir planai bendri visam serveriui, o Streamlit puslapį,
+atidarytą tiesiogiai pagal URL, vykdo be app.py – todėl kiekvienas puslapis prieš bet kokį
+store.* kvietimą pats patikrina prisijungimą (sesijoje arba iš slapuko).
+"""
+import base64
+import binascii
+import hashlib
+import hmac
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import bcrypt
+import streamlit as st
+
+from core import store
+
+DB_PATH = os.path.join(store.DATA_DIR, "auth.sqlite")
+BCRYPT_ROUNDS = 12       # tikslinė kaina; Secrets [auth].bcrypt_rounds ją perrašo
+BCRYPT_WORKERS = 2       # kiek bcrypt skaičiavimų vienu metu (bcrypt atleidžia GIL – tai ir yra CPU riba)
+MAX_PENDING = 16         # laukiančių + vykdomų tikrinimų riba; daugiau – atmetam iškart
+CHECK_TIMEOUT_S = 10.0
+
+MAX_FAILS = 5            # nesėkmių per WINDOW_S, po kurių raktas užrakinamas
+IP_MAX_FAILS = 50        # IP riba daug aukštesnė: už vieno NAT/biuro adreso – daug vartotojų
+WINDOW_S = 15 * 60
+LOCK_S = 30              # pirmas užrakinimas; kiekvienas kitas – dvigubai ilgesnis
+MAX_LOCK_S = 15 * 60
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rehashed (
+    username    TEXT PRIMARY KEY,
+    source_hash TEXT NOT NULL,   -- Secrets hash'as, iš kurio gautas
+    hash        TEXT NOT NULL,
+    updated_at  TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+def cost_of(hashed: str) -> int | None:
+    """$2b$12$... -> 12 (None, jei formatas neatpažintas)."""
+    parts = hashed.split("$")
+    try:
+        return int(parts[2])
+    except (IndexError, ValueError):
+        return None
+
+# =================== Bandymų ribojimas ===================
+class LoginThrottle:
+    """
+    Nesėkmingi bandymai pagal raktą (pvz. "u:<vartotojas>", "ip:<adresas>"): per WINDOW_S
+    surinkus MAX_FAILS – raktas užrakinamas LOCK_S, kiekvienas paskesnis užrakinimas dvigubai ilgesnis.
+    """
+
+    def __init__(self, max_fails=MAX_FAILS, window_s=WINDOW_S, lock_s=LOCK_S, max_lock_s=MAX_LOCK_S):
+        self.max_fails, self.window_s, self.lock_s, self.max_lock_s = max_fails, window_s, lock_s, max_lock_s
+        self._fails = {}   # raktas -> deque[laikas]
+        self._locks = {}   # raktas -> (iki kada, kelintas užrakinimas)
+        self._lock = threading.Lock()
+
+    def locked_for(self, keys) -> float:
+        """Kiek sekundžių dar užrakinta (0 – galima bandyti)."""
+        now = time.monotonic()
+        with self._lock:
+            return max([0.0] + [self._locks[k][0] - now for k in keys if k in self._locks])
+
+    def fail(self, keys):
+        now = time.monotonic()
+        with self._lock:
+            for k in keys:
+                q = self._fails.setdefault(k, deque())
+                q.append(now)
+                while q and q[0] < now - self.window_s:
+                    q.popleft()
+                if len(q) >= self.max_fails:
+                    q.clear()
+                    n = self._locks.get(k, (0, 0))[1] + 1
+                    self._locks[k] = (now + min(self.lock_s * 2 ** (n - 1), self.max_lock_s), n)
+            self._forget_old(now)
+
+    def success(self, keys):
+        with self._lock:
+            for k in keys:
+                self._fails.pop(k, None)
+                self._locks.pop(k, None)
+
+    def _forget_old(self, now):
+        """Kad žodynai neaugtų be galo: pamirštam senus nesėkmių ir užrakinimų įrašus."""
+        for k in [k for k, q in self._fails.items() if not q or q[-1] < now - self.window_s]:
+            del self._fails[k]
+        for k in [k for k, (until, _) in self._locks.items() if until < now - self.max_lock_s]:
+            del self._locks[k]
+
+# =================== Ribotas bcrypt telkinys ===================
+class PasswordChecker:
+    """bcrypt tikrinimas/hash'inimas gijų telkinyje su ribota eile."""
+
+    def __init__(self, workers=BCRYPT_WORKERS, max_pending=MAX_PENDING):
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._slots = threading.BoundedSemaphore(max_pending)
+
+    def _submit(self, fn, *args):
+        """None – eilė pilna."""
+        if not self._slots.acquire(blocking=False):
+            return None
+        fut = self._pool.submit(fn, *args)
+        fut.add_done_callback(lambda _: self._slots.release())
+        return fut
+
+    def check(self, password: str, hashed: str, timeout=CHECK_TIMEOUT_S) -> bool | None:
+        """True/False – slaptažodis tinka/netinka; None – serveris užimtas (eilė pilna ar per ilgai laukta)."""
+        fut = self._submit(_checkpw, password, hashed)
+        if fut is None:
+            return None
+        try:
+            return fut.result(timeout=timeout)
+        except FutureTimeout:
+            return None
+
+    def rehash_later(self, username: str, password: str, source_hash: str, rounds: int):
+        """Perhash'ina fone (prisijungimas jo nelaukia); eilei esant pilnai – kitą kartą."""
+        self._submit(_rehash, username, password, source_hash, rounds)
+
+def _checkpw(password: str, hashed: str) -> bool:
+    try:
+        return bcrypt.checkpw(password.encode("utf-8"), hashed.encode("utf-8"))
+    except ValueError:
+        return False
+
+def _rehash(username: str, password: str, source_hash: str, rounds: int):
+    new = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds)).decode("ascii")
+    con = _connect()
+    try:
+        con.execute(
+            "INSERT INTO rehashed (username, source_hash, hash, updated_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (username) DO UPDATE SET source_hash = excluded.source_hash, "
+            "hash = excluded.hash, updated_at = excluded.updated_at",
+            (username, source_hash, new, time.strftime("%Y-%m-%dT%H:%M:%S")),
+        )
+    finally:
+        con.close()
+
+# =================== Perhash'inti slaptažodžiai ===================
+def _connect() -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
+    con = sqlite3.connect(DB_PATH, timeout=10, isolation_level=None)
+    con.executescript(_SCHEMA)
+    return con
+
+def effective_hash(username: str, secrets_hash: str) -> str:
+    """Perhash'intas hash'as, jei jis gautas iš DABARTINIO Secrets hash'o; kitaip – Secrets hash'as."""
+    con = _connect()
+    try:
+        row = con.execute("SELECT source_hash, hash FROM rehashed WHERE username = ?", (username,)).fetchone()
+    finally:
+        con.close()
+    return row[1] if row and row[0] == secrets_hash else secrets_hash
+
+# =================== Pasirašyti sesijos žetonai ===================
+def _b64(b: bytes) -> str:
+    return base64.urlsafe_b64encode(b).rstrip(b"=").decode("ascii")
+
+def _unb64(s: str) -> bytes:
+    return base64.urlsafe_b64decode(s + "=" * (-len(s) % 4))
+
+def _sign(payload: bytes, key: str) -> bytes:
+    return hmac.new(key.encode("utf-8"), payload, hashlib.sha256).digest()
+
+def _fingerprint(secrets_hash: str) -> str:
+    """Slaptažodžio hash'o antspaudas žetone: pakeitus slaptažodį Secrets'e, seni žetonai nebegalioja."""
+    return hashlib.sha256(secrets_hash.encode("utf-8")).hexdigest()[:16]
+
+def make_token(username: str, secrets_hash: str, key: str, days: int) -> str:
+    """<payload>.<parašas> (base64url, tinka slapukui); payload – vartotojas, galiojimas, hash'o antspaudas."""
+    payload = json.dumps(
+        {"u": username, "exp": int(time.time()) + int(days) * 86400, "h": _fingerprint(secrets_hash)},
+        separators=(",", ":"),
+    ).encode("utf-8")
+    return f"{_b64(payload)}.{_b64(_sign(payload, key))}"
+
+def read_token(token: str | None, key: str, secrets_hash_of) -> str | None:
+    """
+    Vartotojo vardas, jei parašas tinka, žetonas nepasibaigęs ir vartotojo slaptažodis nepakeistas;
+    kitaip None. secrets_hash_of(vartotojas) -> dabartinis Secrets hash'as arba None.
+    """
+    if not token or not key or token.count(".") != 1:
+        return None
+    try:
+        p, s = token.split(".")
+        payload, sig = _unb64(p), _unb64(s)
+    except (ValueError, binascii.Error):
+        return None
+    if not hmac.compare_digest(sig, _sign(payload, key)):
+        return None
+    try:
+        data = json.loads(payload)
+        username, exp, fp = str(data["u"]), int(data["exp"]), str(data["h"])
+    except (ValueError, KeyError, TypeError):
+        return None
+    current = secrets_hash_of(username)
+    if exp < time.time() or current is None or not hmac.compare_digest(fp, _fingerprint(current)):
+        return None
+    return username
+
+# =================== Bendri (visoms sesijoms) objektai ===================
+@st.cache_resource
+def _checker() -> PasswordChecker:
+    return PasswordChecker()
+
+@st.cache_resource
+def _throttle() -> LoginThrottle:
+    return LoginThrottle()
+
+@st.cache_resource
+def _ip_throttle() -> LoginThrottle:
+    return LoginThrottle(max_fails=IP_MAX_FAILS)
+
+def authenticate(username: str, password: str, secrets_hash: str | None, ip: str | None,
+                 rounds: int = BCRYPT_ROUNDS) -> tuple[bool, str | None]:
+    """
+    (ar prisijungta, klaidos tekstas). Užrakinti vartotojas/IP ir pilna eilė atmetami be bcrypt;
+    sėkmingai prisijungus, jei hash'o kaina ne `rounds` – perhash'inama fone.
+    """
+    # (ribotuvas, raktai): vartotojo ir IP nesėkmės skaičiuojamos atskirai, su skirtingomis ribomis
+    limits = [(_throttle(), [f"u:{username.strip().lower()}"])] + ([(_ip_throttle(), [f"ip:{ip}"])] if ip else [])
+    wait = max(t.locked_for(k) for t, k in limits)
+    if wait > 0:
+        return False, f"Per daug nesėkmingų bandymų. Bandyk po {int(wait) + 1} s."
+    if secrets_hash is None:
+        for t, k in limits:
+            t.fail(k)
+        return False, None
+    hashed = effective_hash(username, secrets_hash)
+    ok = _checker().check(password, hashed)
+    if ok is None:
+        return False, "Serveris šiuo metu užimtas – bandyk po kelių sekundžių."
+    if not ok:
+        for t, k in limits:
+            t.fail(k)
+        return False, None
+    limits[0][0].success(limits[0][1])  # IP nesėkmės lieka – vienas teisingas slaptažodis neatrakina spėliojimo kitiems
+    if cost_of(hashed) != rounds:
+        _checker().rehash_later(username, password, secrets_hash, rounds)
+    return True, None
+
+# =================== Sesija ir puslapių vartai ===================
+def users_from_secrets(creds) -> dict:
+    """Secrets [credentials] -> {vartotojas: {name, hash, role}} (tarpai nuvalomi)."""
+    users, names = creds.get("users", []), creds.get("names", [])
+    passwords, roles = creds.get("passwords", []), creds.get("roles", [])
+    return {
+        u: {"name": str(n).strip(), "hash": str(p).strip(), "role": str(r).strip()}
+        for u, n, p, r in zip(users, names, passwords, roles)
+    }
+
+def cookie_settings(auth_conf) -> dict:
+    """Secrets [auth] -> slapuko ir bcrypt nustatymai su numatytosiomis reikšmėmis."""
+    return {
+        "cookie_name": auth_conf.get("cookie_name", "sutartys_login"),
+        "cookie_key": auth_conf.get("cookie_key", ""),
+        "cookie_expiry_days": int(auth_conf.get("cookie_expiry_days", 7)),
+        "bcrypt_rounds": int(auth_conf.get("bcrypt_rounds", BCRYPT_ROUNDS)),
+    }
+
+def current_user() -> str | None:
+    return st.session_state.get("auth_user")
+
+def start_session(username: str, user: dict):
+    """Prisijungimas šiai sesijai (slapuką, jei reikia, rašo kviečiantysis)."""
+    st.session_state["auth_user"] = username
+    st.session_state["auth_name"] = user["name"]
+    st.session_state["auth_role"] = user["role"]
+    st.session_state.pop("auth_logged_out", None)
+
+def restore_session(users: dict, conf: dict) -> str | None:
+    """Naujas skirtukas / persijungimas: galiojantis slapuko žetonas -> prisijungimas be bcrypt (tik HMAC)."""
+    if current_user() is not None or st.session_state.get("auth_logged_out"):
+        return current_user()
+    user = read_token(
+        st.context.cookies.get(conf["cookie_name"]), conf["cookie_key"],
+        lambda u: users[u]["hash"] if u in users else None,
+    )
+    if user is not None:
+        start_session(user, users[user])
+    return user
+
+def require_login() -> str:
+    """
+    Puslapio pradžioje: prisijungęs vartotojas (sesijoje arba atkurtas iš slapuko);
+    neprisijungus – nuoroda į prisijungimą ir st.stop(), kad toliau niekas nebūtų vykdoma.
+    """
+    if current_user() is None:
+        try:
+            users = users_from_secrets(st.secrets["credentials"])
+            conf = cookie_settings(st.secrets["auth"])
+        except Exception:  # Secrets nėra/netvarkingi – app.py tai parodys; čia tiesiog neprisijungta
+            users, conf = {}, None
+        if conf is not None and conf["cookie_key"]:
+            restore_session(users, conf)
+    user = current_user()
+    if user is None:
+        st.warning("🔐 Šis puslapis pasiekiamas tik prisijungus – prisijunk pagrindiniame puslapyje.")
+        st.stop()
+    return user
@@ -0,0 +1,81 @@
+"""
+Sutarčių raktų žodynas: (Klientas, SutartiesID) -> int32 kodas.
+
+Raktai normalizuojami VIENĄ kartą rinkinio versijai (prepare_inv), o puslapio groupby ir
+merge eina per sveikuosius kodus. Kodai sunumeruoti pagal (Klientas, SutartiesID) rikiavimą,
+todėl rikiuoti pagal kodą = rikiuoti pagal raktus. Nerastas raktas -> -1.
+"""
+import numpy as np
+import pandas as pd
+
+KEYS = ["Klientas", "SutartiesID"]
+CODE = "Kodas"
+
+def norm_key_col(s: pd.Series) -> pd.Series:
+    """"" jei NaN, kitaip str(v).strip() – skaičiuojama tik unikalioms reikšmėms."""
+    codes, uniq = pd.factorize(s, use_na_sentinel=True)
+    vals = pd.Index(uniq, dtype=object).map(str).str.strip().to_numpy(dtype=object)
+    return pd.Series(np.where(codes >= 0, vals[codes] if len(vals) else "", ""), index=s.index, dtype=object)
+
+def norm_keys(df: pd.DataFrame, keys=KEYS) -> pd.DataFrame:
+    """Raktų stulpelių normalizavimas vietoje (trūkstamas stulpelis -> "")."""
+    for k in keys:
+        df[k] = norm_key_col(df[k]) if k in df.columns else ""
+    return df
+
+class ContractDict:
+    """Bendras sutarčių žodynas: keys[kodas] = (Klientas, SutartiesID)."""
+
+    def __init__(self, keys: pd.DataFrame):
+        self.keys = keys.reset_index(drop=True)[KEYS]
+        self.klientai = pd.Index(self.keys["Klientas"].unique())
+        self.sutartys = pd.Index(self.keys["SutartiesID"].unique())
+        self._pairs = self._pair(self.keys["Klientas"], self.keys["SutartiesID"])
+        self._order = np.argsort(self._pairs, kind="stable")
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def _pair(self, klientas, sutartis) -> np.ndarray:
+        kc = self.klientai.get_indexer(np.asarray(klientas, dtype=object))
+        sc = self.sutartys.get_indexer(np.asarray(sutartis, dtype=object))
+        return np.where((kc >= 0) & (sc >= 0), kc.astype(np.int64) * len(self.sutartys) + sc, -1)
+
+    def encode(self, klientas, sutartis) -> np.ndarray:
+        """Normalizuotų raktų kodai (int32); žodyne nesantiems -> -1."""
+        p = self._pair(klientas, sutartis)
+        code = np.full(len(p), -1, dtype=np.int32)
+        if len(self):
+            pos = np.minimum(np.searchsorted(self._pairs, p, sorter=self._order), len(self) - 1)
+            cand = self._order[pos]
+            hit = (p >= 0) & (self._pairs[cand] == p)
+            code[hit] = cand[hit]
+        return code
+
+    def decode(self, codes) -> pd.DataFrame:
+        """Kodai -> (Klientas, SutartiesID); -1 -> tušti stringai."""
+        codes = np.asarray(codes)
+        ok = codes >= 0
+        if not len(self):
+            return pd.DataFrame({k: np.full(len(codes), "", dtype=object) for k in KEYS})
+        safe = np.where(ok, codes, 0)
+        return pd.DataFrame({k: np.where(ok, self.keys[k].to_numpy(dtype=object)[safe], "") for k in KEYS})
+
+def factorize_contracts(klientas: pd.Series, sutartis: pd.Series):
+    """
+    Kaip pd.factorize, tik raktų porai: (int32 kodai, ContractDict).
+    Raktai turi būti jau normalizuoti (norm_key_col): NaN/None nepriimami – pd.factorize juos
+    koduotų -1 ir pora gautų svetimą raktą.
+    """
+    for name, s in (("Klientas", klientas), ("SutartiesID", sutartis)):
+        if pd.isna(s).any():
+            raise ValueError(f"factorize_contracts: {name} turi trūkstamų reikšmių – pirma norm_key_col")
+    kc, kl = pd.factorize(klientas, sort=True)
+    sc, sl = pd.factorize(sutartis, sort=True)
+    n_s = max(len(sl), 1)
+    codes, uniq = pd.factorize(kc.astype(np.int64) * n_s + sc, sort=True)
+    keys = pd.DataFrame({
+        "Klientas": np.asarray(kl, dtype=object)[uniq // n_s],
+        "SutartiesID": np.asarray(sl, dtype=object)[uniq % n_s],
+    })
+    return codes.astype(np.int32), ContractDict(keys)
@@ -0,0 +1,56 @@
+"""
+Grafikų taškų mažinimas serveryje: Plotly figūros dydis lieka ribotas, kad ir koks ilgas
+laikotarpis. Linijoms – LTTB (išlaiko formą ir ekstremumus), stulpeliams – gretimų
+periodų sujungimas į k-periodų grupes.
+"""
+import numpy as np
+import pandas as pd
+
+MAX_LINE_POINTS = 600
+MAX_BARS = 300
+
+def lttb_indices(x, y, n_out: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets: n_out taškų indeksai (pirmas ir paskutinis – visada)."""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)  # vidiniai kibirai [edges[i]; edges[i+1])
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # kito kibiro vidurkis (paskutiniam – paskutinis taškas)
+        nlo, nhi = hi, (edges[i + 2] if i + 2 < len(edges) else n)
+        cx, cy = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.nanargmax(area)) if np.isfinite(area).any() else lo
+        out[i + 1] = a
+    return out
+
+def downsample_line(df: pd.DataFrame, x: str, y: str, max_points: int = MAX_LINE_POINTS) -> pd.DataFrame:
+    """Linijos taškai per LTTB (x – datos arba skaičiai); trumpos serijos grąžinamos kaip yra."""
+    if len(df) <= max_points:
+        return df
+    xs = df[x].to_numpy(dtype="datetime64[ns]").astype(np.int64) if pd.api.types.is_datetime64_any_dtype(df[x]) else df[x].to_numpy()
+    idx = lttb_indices(xs, df[y].to_numpy(), max_points)
+    return df.iloc[idx]
+
+def coarsen_bars(df: pd.DataFrame, x: str, y: str, max_bars: int = MAX_BARS) -> tuple[pd.DataFrame, int]:
+    """
+    Jei stulpelių daugiau nei max_bars – k gretimų periodų sujungiami į vieną (x – grupės pradžia,
+    y – vidurkis per periodą, kad mastelis sutaptų su nesujungta serija). Grąžina (df, k).
+    Eilutės grupuojamos pagal poziciją, todėl df turi būti ištisinė periodų eilė (tušti – 0).
+    """
+    n = len(df)
+    if n <= max_bars:
+        return df, 1
+    k = -(-n // max_bars)
+    grp = np.arange(n) // k
+    out = pd.DataFrame({
+        x: df[x].to_numpy()[::k],
+        y: df[y].groupby(grp).mean().to_numpy(),
+    })
+    return out, k
@@ -0,0 +1,80 @@
+"""
+Eksportai: Excel per greitą rašytoją (xlsxwriter, o jei jo nėra – openpyxl write_only,
+eilutė po eilutės), arba CSV / Parquet labai didelėms lentelėms.
+Keli lapai CSV/Parquet formatu supakuojami į .zip (po failą lapui).
+"""
+import zipfile
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+try:
+    import xlsxwriter  # noqa: F401  – neprivalomas, bet ženkliai greitesnis už openpyxl
+    XLSX_ENGINE = "xlsxwriter"
+except ImportError:
+    XLSX_ENGINE = "openpyxl"
+
+EXPORT_FORMATS = {"Excel (.xlsx)": "xlsx", "CSV": "csv", "Parquet": "parquet"}
+XLSX_MAX_ROWS = 1_048_575  # Excel lapo riba (be antraštės eilutės)
+
+MIME = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+    "zip": "application/zip",
+}
+
+def fits_xlsx(sheets: dict) -> bool:
+    return all(len(df) <= XLSX_MAX_ROWS for df in sheets.values())
+
+def _py(v):
+    """Reikšmė Excel rašytojui: NaN/NaT -> tuščia, numpy tipai -> Python."""
+    if v is None or (not isinstance(v, str) and pd.isna(v)):
+        return None
+    if isinstance(v, pd.Timestamp):
+        return v.to_pydatetime()
+    if isinstance(v, np.generic):
+        return v.item()
+    return v
+
+def _xlsx_openpyxl_write_only(sheets: dict, buf: BytesIO):
+    from openpyxl import Workbook
+    wb = Workbook(write_only=True)
+    for name, df in sheets.items():
+        ws = wb.create_sheet(title=name)
+        ws.append([str(c) for c in df.columns])
+        for row in df.itertuples(index=False, name=None):
+            ws.append([_py(v) for v in row])
+    wb.save(buf)
+
+def to_xlsx(sheets: dict) -> bytes:
+    """{lapo pavadinimas: DataFrame} -> .xlsx baitai."""
+    buf = BytesIO()
+    if XLSX_ENGINE == "xlsxwriter":
+        with pd.ExcelWriter(buf, engine="xlsxwriter") as xw:
+            for name, df in sheets.items():
+                df.to_excel(xw, sheet_name=name, index=False)
+    else:
+        _xlsx_openpyxl_write_only(sheets, buf)
+    return buf.getvalue()
+
+def _one(df: pd.DataFrame, fmt: str) -> bytes:
+    if fmt == "csv":
+        return df.to_csv(index=False).encode("utf-8-sig")  # BOM – kad Excel teisingai rodytų lietuviškas raides
+    buf = BytesIO()
+    df.to_parquet(buf, index=False)
+    return buf.getvalue()
+
+def export_bytes(sheets: dict, fmt: str):
+    """Grąžina (baitai, plėtinys, mime). CSV/Parquet su keliais lapais -> .zip."""
+    if fmt == "xlsx":
+        return to_xlsx(sheets), "xlsx", MIME["xlsx"]
+    if len(sheets) == 1:
+        (df,) = sheets.values()
+        return _one(df, fmt), fmt, MIME[fmt]
+    buf = BytesIO()
+    with zipfile.ZipFile(buf, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for name, df in sheets.items():
+            zf.writestr(f"{name}.{fmt}", _one(df, fmt))
+    return buf.getvalue(), "zip", MIME["zip"]
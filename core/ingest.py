@@ -0,0 +1,243 @@
+"""
+Excel įkėlimas: skaitymas BE antraščių pagal stulpelių raides ir tipų suvedimas.
+
+Modulis be Streamlit priklausomybių – jo funkcijos vykdomos procesų telkinyje
+(parse_parallel): kiekvienas (failas, lapas) – atskira užduotis, todėl kelių failų ar lapų
+įkėlimas trunka maždaug tiek, kiek ilgiausias vienas skaitymas, o ne jų suma.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+from core.keys import norm_keys_exact
+from core.money import to_cents
+
+try:
+    # Neprivalomas, ženkliai greitesnis skaitytuvas (Rust „calamine“); jei neįdiegtas – openpyxl
+    from python_calamine import CalamineWorkbook
+except ImportError:
+    CalamineWorkbook = None
+
+from openpyxl import load_workbook
+from openpyxl.cell.cell import ERROR_CODES
+from openpyxl.utils import column_index_from_string
+
+NAMES = ("Data", "Saskaitos_NR", "Klientas", "SutartiesID", "Suma")
+SOURCE_COLS = ("Saltinis", "Lapas")  # kilmė: failo ir lapo pavadinimai (į dokumentų palyginimą neįeina)
+USECOLS = "A,B,D,F,G"
+CHUNK_ROWS = 50_000  # kiek eilučių verčiam į tipizuotus masyvus vienu kartu
+MAX_WORKERS = max(1, min(4, os.cpu_count() or 1))  # kiekvienas procesas laiko savo darbaknygę atmintyje
+
+def _letters_to_idx(usecols: str) -> list:
+    """„A,B,D,F,G“ -> [0, 1, 3, 5, 6]."""
+    return [column_index_from_string(c.strip()) - 1 for c in usecols.split(",")]
+
+def _cell(v):
+    """Langelio reikšmė kaip pd.read_excel: tuščia/klaida -> None, sveikas float -> int."""
+    if v is None or v == "":
+        return None
+    if isinstance(v, float) and v.is_integer():
+        return int(v)
+    if isinstance(v, str) and v in ERROR_CODES:
+        return None
+    return v
+
+def _is_empty_row(row) -> bool:
+    return all(v is None or v == "" for v in row)
+
+def _rows_openpyxl(file_or_buf, idx, sheet: int = 0):
+    """
+    Eilutės read_only režimu (be viso darbaknygės modelio): (reikiami stulpeliai, ar visa eilutė tuščia).
+    Visos eilutės tuštumą tikrinam, nes pd.read_excel galines eilutes kerpa pagal VISUS stulpelius.
+    """
+    wb = load_workbook(file_or_buf, read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[sheet]
+        for row in ws.iter_rows(values_only=True):
+            n = len(row)
+            yield [_cell(row[i]) if i < n else None for i in idx], _is_empty_row(row)
+    finally:
+        wb.close()
+
+def _rows_calamine(file_or_buf, idx, sheet: int = 0):
+    """Tas pats per calamine; eilutės prasideda nuo A1, stulpeliai – nuo sheet.start."""
+    if isinstance(file_or_buf, (str, os.PathLike)):
+        wb = CalamineWorkbook.from_path(os.fspath(file_or_buf))
+    else:
+        wb = CalamineWorkbook.from_filelike(file_or_buf)
+    try:
+        ws = wb.get_sheet_by_index(sheet)
+        c0 = ws.start[1] if ws.start else 0
+        for row in ws.iter_rows():
+            n = len(row)
+            yield [_cell(row[i - c0]) if 0 <= i - c0 < n else None for i in idx], _is_empty_row(row)
+    finally:
+        wb.close()
+
+def _chunk_to_frame(rows, names) -> pd.DataFrame:
+    """Eilučių gabalas -> stulpelių masyvai; Data/Suma iškart paverčiam tipais."""
+    cols = list(zip(*rows))
+    df = pd.DataFrame({n: np.array(c, dtype=object) for n, c in zip(names, cols)})
+    df["Data"] = pd.to_datetime(df["Data"], errors="coerce")
+    df["Suma"] = pd.to_numeric(df["Suma"], errors="coerce")
+    return df
+
+def read_by_letters(file_or_buf, names=NAMES, usecols=USECOLS, sheet: int = 0) -> pd.DataFrame:
+    """
+    Skaito Excel BE antraščių ir paima konkrečius stulpelius:
+    A=Data, B=Sąskaitos_NR, D=Klientas, F=SutartiesID, G=Suma.
+    Srautinis skaitymas: eilutės einamos read_only režimu (arba per calamine, jei įdiegtas)
+    ir gabalais po CHUNK_ROWS verčiamos į tipizuotus stulpelius – viso lapo atmintyje nelaikom.
+    sheet – lapo eilės numeris (nuo 0).
+    """
+    idx = _letters_to_idx(usecols)
+    if hasattr(file_or_buf, "seek"):
+        file_or_buf.seek(0)
+    rows_iter = _rows_calamine if CalamineWorkbook is not None else _rows_openpyxl
+
+    chunks, rows, pending = [], [], []
+    for r, empty in rows_iter(file_or_buf, idx, sheet):
+        # Tuščias eilutes laikom atskirai: pd.read_excel nukerpa tik GALINES tuščias eilutes
+        if empty:
+            pending.append(r)
+            continue
+        if pending:
+            rows.extend(pending)
+            pending = []
+        rows.append(r)
+        if len(rows) >= CHUNK_ROWS:
+            chunks.append(_chunk_to_frame(rows, names))
+            rows = []
+    if rows:
+        chunks.append(_chunk_to_frame(rows, names))
+    if not chunks:
+        chunks.append(_chunk_to_frame([[None] * len(idx)], names).iloc[0:0])
+
+    df = pd.concat(chunks, ignore_index=True)
+
+    # Tipai ir sanitarija (tekstiniams stulpeliams tipą spėjam VIENĄ kartą visam stulpeliui)
+    df["Data"] = pd.to_datetime(df["Data"], errors="coerce")
+    df["Suma"] = pd.to_numeric(df["Suma"], errors="coerce")
+    for c in ("Klientas","SutartiesID","Saskaitos_NR"):
+        df[c] = df[c].infer_objects().astype(str).str.strip()
+
+    # Pas tave be PVM -> lygu Suma; saugom int64 centais (nukirpta iki centų, žr. core.money)
+    df["Suma_su_PVM"] = to_cents(df["Suma"])
+    return df
+
+def sheet_names(data: bytes) -> list:
+    """Darbaknygės lapų pavadinimai (tik metaduomenys – lapų turinys neskaitomas)."""
+    if CalamineWorkbook is not None:
+        wb = CalamineWorkbook.from_filelike(BytesIO(data))
+        try:
+            return list(wb.sheet_names)
+        finally:
+            wb.close()
+    wb = load_workbook(BytesIO(data), read_only=True)
+    try:
+        return list(wb.sheetnames)
+    finally:
+        wb.close()
+
+def combine_sources(frames, sources, key_col: str = "Saskaitos_NR"):
+    """
+    Sujungia nuskaitytus lapus į vieną rinkinį. frames – lapai įkėlimo tvarka, sources –
+    atitinkami (failas, lapas), kurie įrašomi į SOURCE_COLS.
+    Deduplikacija tarp šaltinių dokumento lygiu (norm_key_exact(key_col)): dokumentas, esantis
+    keliuose šaltiniuose, imamas tik iš PASKUTINIO (vėlesnis failas/lapas laikomas naujesniu
+    eksportu), jo eilutės tame šaltinyje – visos. Eilutės be numerio – be identiškų pasikartojimų tarp šaltinių.
+    Grąžina (df, statistika).
+    """
+    parts, src = [], []
+    for i, (df, (name, sheet)) in enumerate(zip(frames, sources)):
+        parts.append(df.assign(**{SOURCE_COLS[0]: name, SOURCE_COLS[1]: sheet}))
+        src.append(np.full(len(df), i))
+    df = pd.concat(parts, ignore_index=True)
+    src = np.concatenate(src) if src else np.zeros(0, dtype=int)
+
+    keys = norm_keys_exact(df[key_col]).to_numpy()
+    has_key = keys != ""
+    last = pd.Series(src[has_key]).groupby(keys[has_key]).transform("max").to_numpy()
+    keep = ~has_key
+    keep[has_key] = src[has_key] == last
+    # Be numerio: eilutė iš kito šaltinio, jei tokia pati jau yra ankstesniame, praleidžiama
+    # (to paties šaltinio pasikartojimai lieka – kaip ir skaitant vieną failą)
+    nk = ~has_key
+    h = pd.util.hash_pandas_object(df.loc[nk, [c for c in df.columns if c not in SOURCE_COLS]], index=False).to_numpy()
+    keep[nk] = src[nk] == pd.Series(src[nk]).groupby(h).transform("min").to_numpy()
+
+    docs = pd.DataFrame({"k": keys[has_key], "s": src[has_key]}).drop_duplicates()
+    stats = {
+        "šaltinių (lapų)": int(sum(len(f) > 0 for f in frames)),
+        "dok. keliuose šaltiniuose": int(docs.loc[docs["k"].duplicated(), "k"].nunique()),
+        "pašalinta pasikartojančių eilučių": int((~keep).sum()),
+    }
+    df = df.loc[keep].reset_index(drop=True)
+    for c in SOURCE_COLS:
+        df[c] = df[c].astype("category")
+    return df, stats
+
+def parse_shard(data: bytes, sheet: int = 0, usecols: str = USECOLS) -> pd.DataFrame:
+    """Viena telkinio užduotis: failo turinys + lapas -> normalizuotas DataFrame."""
+    return read_by_letters(BytesIO(data), usecols=usecols, sheet=sheet)
+
+# =================== Procesų telkinys ===================
+_pool_lock = threading.Lock()
+_pool: ProcessPoolExecutor | None = None
+
+def _get_pool() -> ProcessPoolExecutor:
+    """
+    Vienas telkinys visam serveriui (sukuriamas pirmo įkėlimo metu ir laikomas).
+    „spawn“, ne „fork“: Streamlit procesas daugiagijis, o fork'intas vaikas gali paveldėti užimtus užraktus.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=MAX_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+def parse_parallel(shards, on_progress=None) -> list:
+    """
+    shards – [(data, sheet, usecols), ...]; grąžina DataFrame'us ta pačia tvarka.
+    Užduotys vykdomos lygiagrečiai telkinyje; on_progress(atlikta, iš_viso) kviečiamas
+    kviečiančioje gijoje po kiekvienos baigtos užduoties. Jei telkinio paleisti nepavyksta
+    (ar jis sugenda), likusios užduotys atliekamos šiame procese.
+    """
+    n = len(shards)
+    out = [None] * n
+    done = 0
+    try:
+        pool = _get_pool()
+        futs = {pool.submit(parse_shard, *s): i for i, s in enumerate(shards)}
+    except (OSError, RuntimeError, BrokenProcessPool):
+        _reset_pool()
+        futs = {}
+    for f in as_completed(futs):
+        try:
+            out[futs[f]] = f.result()
+        except BrokenProcessPool:
+            _reset_pool()
+            break
+        done += 1
+        if on_progress:
+            on_progress(done, n)
+    for i, s in enumerate(shards):
+        if out[i] is None:
+            out[i] = parse_shard(*s)
+            done += 1
+            if on_progress:
+                on_progress(done, n)
+    return out
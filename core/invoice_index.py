@@ -0,0 +1,95 @@
+"""
+Išrašytų sąskaitų numerių indeksas kreditinių pririšimui prie sutarčių:
+Key_exact -> (Klientas, SutartiesID), o jei nerasta – Key_digits -> (Klientas, SutartiesID).
+
+Indeksas skaičiuojamas VIENĄ kartą rinkinio versijai, saugomas šalia jos (store priedas)
+ir per st.cache_resource dalijamas visoms sesijoms. Papildant rinkinį (append) naujos
+versijos indeksas išvedamas iš seno + deltos, viso rinkinio neperskaitant; papildymo versijai
+(store deltų grandinei) įrašomi tik deltos įrašai, o pilnas indeksas atkuriamas iš bazės + segmentų.
+"""
+import pandas as pd
+import streamlit as st
+
+from core import store
+from core.contracts import norm_key_col
+from core.keys import norm_keys_exact, norm_keys_digits
+
+KIND = "inv_norm"
+SIDECAR = "invoice_index"
+SEG_SIDECAR = "invoice_index_seg"  # papildymo segmento (tik deltos) įrašai
+SORT_COLS = ["Data", "Saskaitos_NR"]
+
+def build_entries(inv: pd.DataFrame) -> pd.DataFrame:
+    """
+    Po vieną įrašą kiekvienam Key_exact: paskutinė eilutė pagal (Data, Saskaitos_NR),
+    t.y. ta pati, kurią duotų sort_values + drop_duplicates(keep="last").
+    """
+    d = inv.loc[inv["Saskaitos_NR"].notna()]
+    d = pd.DataFrame({
+        "Data": pd.to_datetime(d["Data"], errors="coerce") if "Data" in d.columns else pd.NaT,
+        "Saskaitos_NR": d["Saskaitos_NR"].astype(str).str.strip().str.upper(),
+        "Klientas": norm_key_col(d["Klientas"]) if "Klientas" in d.columns else "",
+        "SutartiesID": norm_key_col(d["SutartiesID"]) if "SutartiesID" in d.columns else "",
+    }, index=d.index)
+    d = d.sort_values(SORT_COLS, kind="mergesort")
+    d["Key_exact"] = norm_keys_exact(d["Saskaitos_NR"])
+    d["Key_digits"] = norm_keys_digits(d["Saskaitos_NR"])
+    d = d[d["Key_exact"] != ""].drop_duplicates(subset=["Key_exact"], keep="last")
+    return d.reset_index(drop=True)
+
+class InvoiceIndex:
+    """Dviejų lygių paieška: exact raktas, o jei sutarties nėra – skaitmenų raktas."""
+
+    def __init__(self, entries: pd.DataFrame):
+        self.entries = entries
+        self.exact = entries.set_index("Key_exact")[["Klientas", "SutartiesID"]]
+        # Skaitmenų lygiui laimi vėliausias exact įrašas (tas pats, kas vėliausia eilutė)
+        dig = entries.sort_values(SORT_COLS, kind="mergesort")
+        dig = dig[dig["Key_digits"] != ""].drop_duplicates(subset=["Key_digits"], keep="last")
+        self.digits = dig.set_index("Key_digits")[["Klientas", "SutartiesID"]]
+
+    def link(self, ref_exact: pd.Series, ref_digits: pd.Series) -> pd.DataFrame:
+        """(Klientas, SutartiesID) kiekvienai nuorodai; nepririštoms – tušti stringai."""
+        hit = self.exact.reindex(ref_exact.to_numpy())
+        sid = hit["SutartiesID"]
+        need = (sid.isna() | (sid.astype(str).str.strip() == "")).to_numpy()
+        if need.any():
+            fb = self.digits.reindex(ref_digits.to_numpy()[need])
+            hit.iloc[need, :] = fb.to_numpy()
+        return pd.DataFrame({
+            "Klientas": hit["Klientas"].fillna("").to_numpy(),
+            "SutartiesID": hit["SutartiesID"].fillna("").to_numpy(),
+        }, index=ref_exact.index)
+
+def _apply(entries: pd.DataFrame, fresh: pd.DataFrame) -> pd.DataFrame:
+    """Seni įrašai be deltos raktų + deltos įrašai."""
+    return pd.concat([entries[~entries["Key_exact"].isin(fresh["Key_exact"])], fresh], ignore_index=True)
+
+def _entries(version: str) -> pd.DataFrame:
+    entries = store.load_sidecar(KIND, version, SIDECAR)
+    if entries is not None:
+        return entries
+    ch = store.chain(KIND, version)
+    if ch is not None:
+        parts = [store.load_sidecar(KIND, s, SEG_SIDECAR) for s in ch[1]]
+        if all(p is not None for p in parts):
+            entries = _entries(ch[0])
+            for fresh in parts:
+                entries = _apply(entries, fresh)
+            return entries
+    entries = build_entries(store.load(KIND, version))
+    store.save_sidecar(KIND, version, SIDECAR, entries)
+    return entries
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def get_index(version: str) -> InvoiceIndex:
+    """Versijos indeksas: iš disko priedo(-ų), o jei jų nėra – sukuriamas ir išsaugomas."""
+    return InvoiceIndex(_entries(version))
+
+def update_on_append(old_version: str, new_version: str, delta: pd.DataFrame):
+    """Naujos versijos indeksas = seno įrašai be deltos raktų + deltos įrašai (grandinėje – tik deltos įrašai)."""
+    fresh = build_entries(delta)
+    if store.chain(KIND, new_version) is not None:
+        store.save_sidecar(KIND, new_version, SEG_SIDECAR, fresh)
+    else:
+        store.save_sidecar(KIND, new_version, SIDECAR, _apply(get_index(old_version).entries, fresh))
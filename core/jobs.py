@@ -0,0 +1,129 @@
+"""
+Foniniai skaičiavimai: sunkūs etapai vykdomi gijų telkinyje, ne Streamlit skripto gijoje.
+
+Registras raktuojamas įvesties raktu (pvz. rinkinių versijos): tas pats skaičiavimas, kurio
+paprašė kelios sesijos ar perpiešimai, vykdomas VIENĄ kartą. Skriptas nelaukia – rodo eigą
+(ir, jei yra, paskutinį gerą rezultatą), o užduotis tęsiasi, net jei skriptas perpieštas
+ar sesija uždaryta. Užduotys pildo tuos pačius st.cache_* podėlius, todėl baigus
+puslapio skriptas juos tik paima.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+MAX_WORKERS = 2   # foninių užduočių vienu metu (pandas/numpy dalį darbo atlieka be GIL)
+KEEP_DONE = 16    # kiek baigtų užduočių (su rezultatais) laikom registre
+THREAD_PREFIX = "sutartys-job"
+
+class _NoCtxWarning(logging.Filter):
+    """Užduočių gijos neturi ScriptRunContext – tai tyčia, todėl šio perspėjimo jose nerašom."""
+
+    def filter(self, record):
+        return not threading.current_thread().name.startswith(THREAD_PREFIX)
+
+class Job:
+    """Viena užduotis: eiga (0–1 + tekstas), rezultatas arba klaida."""
+
+    def __init__(self, key, label: str, group: str | None):
+        self.key = key
+        self.label = label
+        self.group = group
+        self.progress = 0.0
+        self.text = ""
+        self.result = None
+        self.error: Exception | None = None
+        self.started = time.monotonic()
+        self.finished: float | None = None
+        self._done = threading.Event()  # nustatoma PASKUTINĖ – po result/error
+
+    def report(self, frac: float, text: str = ""):
+        """Kviečiama iš užduoties: eigos dalis ir (neprivalomas) etapo aprašas."""
+        self.progress = min(max(float(frac), 0.0), 1.0)
+        if text:
+            self.text = text
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """Trumpai palaukti (pvz. kad greitos užduotys neblykstelėtų eigos juosta); True – baigta."""
+        return self._done.wait(timeout)
+
+    @property
+    def ok(self) -> bool:
+        return self.done and self.error is None
+
+class JobRunner:
+    """Gijų telkinys + registras (raktas -> Job) + paskutinė sėkminga užduotis kiekvienai grupei."""
+
+    def __init__(self, max_workers: int = MAX_WORKERS, keep_done: int = KEEP_DONE):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=THREAD_PREFIX)
+        self._jobs = OrderedDict()
+        self._last = {}
+        self._lock = threading.Lock()
+        self.keep_done = keep_done
+        logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").addFilter(_NoCtxWarning())
+
+    def submit(self, key, fn, label: str = "", group: str | None = None) -> Job:
+        """
+        fn(job) vykdoma fone; grąžina Job. Jei tas pats raktas jau vykdomas ar sėkmingai baigtas –
+        grąžinama esama užduotis (nieko iš naujo nepaleidžiam). Nepavykusi užduotis paleidžiama iš naujo.
+        """
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and not (job.done and job.error is not None):
+                self._jobs.move_to_end(key)
+                return job
+            job = Job(key, label, group)
+            self._jobs[key] = job
+            self._prune()
+        self._pool.submit(self._run, job, fn)
+        return job
+
+    def last_good(self, group: str) -> Job | None:
+        """Paskutinė sėkmingai baigta grupės užduotis (nepriklausomai nuo rakto)."""
+        with self._lock:
+            return self._last.get(group)
+
+    def _run(self, job: Job, fn):
+        try:
+            job.result = fn(job)
+            job.report(1.0)
+        except Exception as e:  # klaidą rodo puslapis; gija lieka gyva
+            job.error = e
+        finally:
+            job.finished = time.monotonic()
+            job._done.set()
+            with self._lock:
+                if job.ok and job.group is not None:
+                    self._last[job.group] = job
+                self._prune()
+
+    def _prune(self):
+        """Išmeta seniausiai naudotas BAIGTAS užduotis virš keep_done (vykdomos lieka visada)."""
+        done = [k for k, j in self._jobs.items() if j.done]
+        for k in done[:max(0, len(done) - self.keep_done)]:
+            del self._jobs[k]
+
+@st.cache_resource
+def runner() -> JobRunner:
+    """Vienas registras visam serveriui – taip sutampančios užduotys dalijamos tarp sesijų."""
+    return JobRunner()
+
+def show_progress(job: Job, poll: float = 1.0):
+    """
+    Eigos juosta, kurią periodiškai atnaujina fragmentas (ne visas puslapis);
+    užduočiai pasibaigus perpiešiamas visas puslapis, kad šis paimtų rezultatą.
+    """
+    @st.fragment(run_every=poll)
+    def _poll():
+        if job.done:
+            st.rerun()
+        text = f"{job.label}: {job.text}" if job.text else job.label
+        st.progress(job.progress, text=f"{text} ({time.monotonic() - job.started:.0f} s)")
+    _poll()
@@ -0,0 +1,76 @@
+"""Sąskaitų numerių raktai: VS/AAA nuorodų ištraukimas iš Pastabų ir numerių normalizavimas."""
+import re
+
+import numpy as np
+import pandas as pd
+
+# --- VS/AAA ekstraktorius: tikslus, be bendro fallback ---
+def extract_first_invoice_from_notes(text: str) -> str:
+    """Grąžina pirmą VS/AAA numerį iš Pastabų (pvz., VS-241951, VS 241951, VS241951, VS-241951/1; AAA analogiškai)."""
+    if pd.isna(text) or text is None:
+        return ""
+    s = str(text)
+    m = re.search(r'\b(VS[-\s]?\d+(?:/\d+)?)\b', s, flags=re.IGNORECASE)
+    if m:
+        return m.group(1).upper()
+    m = re.search(r'\b(AAA[-\s]?\d+(?:/\d+)?)\b', s, flags=re.IGNORECASE)
+    if m:
+        return m.group(1).upper()
+    return ""
+
+def norm_key_exact(s: str) -> str:
+    """A-Z0-9 raktas (šalinami tarpai/skyryba); „VS-241951/1“ → „VS2419511“."""
+    if pd.isna(s) or s is None or s == "":
+        return ""
+    s = str(s).upper().replace("\u00A0", " ").replace("–", "-").replace("—", "-")
+    s = re.sub(r"\s+", "", s)
+    return re.sub(r"[^A-Z0-9]", "", s)
+
+def norm_key_digits(s: str) -> str:
+    """Tik skaitmenys – „VS-241951/1“ → „2419511“."""
+    if pd.isna(s) or s is None or s == "":
+        return ""
+    return re.sub(r"[^0-9]", "", str(s))
+
+# =================== Vektorinės (stulpelių) versijos ===================
+# Tie patys šablonai kaip aukščiau, bet sukompiliuoti vieną kartą
+VS_RE = re.compile(r'\b(VS[-\s]?\d+(?:/\d+)?)\b', flags=re.IGNORECASE)
+AAA_RE = re.compile(r'\b(AAA[-\s]?\d+(?:/\d+)?)\b', flags=re.IGNORECASE)
+NOT_ALNUM_RE = re.compile(r"[^A-Z0-9]")
+NOT_DIGIT_RE = re.compile(r"[^0-9]")
+
+def _per_unique(s: pd.Series, fn) -> pd.Series:
+    """
+    fn skaičiuojama tik UNIKALIOMS reikšmėms (pastabos ir numeriai labai kartojasi),
+    rezultatas išskleidžiamas atgal per factorize kodus. NaN -> "".
+    """
+    codes, uniq = pd.factorize(s, use_na_sentinel=True)
+    if len(uniq) == 0:
+        return pd.Series("", index=s.index, dtype=object)
+    vals = np.asarray(fn(pd.Series(uniq, dtype=object).map(str)), dtype=object)
+    return pd.Series(np.where(codes >= 0, vals[codes], ""), index=s.index, dtype=object)
+
+def norm_keys_exact(s: pd.Series) -> pd.Series:
+    """norm_key_exact visam stulpeliui (A-Z0-9 po upper – kiti simboliai vis tiek šalinami)."""
+    return _per_unique(s, lambda u: u.str.upper().str.replace(NOT_ALNUM_RE, "", regex=True))
+
+def norm_keys_digits(s: pd.Series) -> pd.Series:
+    """norm_key_digits visam stulpeliui."""
+    return _per_unique(s, lambda u: u.str.replace(NOT_DIGIT_RE, "", regex=True))
+
+def _first_ref(u: pd.Series) -> pd.Series:
+    vs = u.str.extract(VS_RE, expand=False)
+    aaa = u.str.extract(AAA_RE, expand=False)
+    return vs.fillna(aaa).fillna("").str.upper()
+
+def extract_invoice_refs(notes: pd.Series) -> pd.DataFrame:
+    """
+    extract_first_invoice_from_notes + abu raktai visam Pastabų stulpeliui vienu kartu.
+    Grąžina DataFrame: Ref_raw, Ref_exact, Ref_digits (tas pats indeksas kaip notes).
+    """
+    raw = _per_unique(notes, _first_ref)
+    return pd.DataFrame({
+        "Ref_raw": raw,
+        "Ref_exact": norm_keys_exact(raw),
+        "Ref_digits": norm_keys_digits(raw),
+    }, index=notes.index)
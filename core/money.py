@@ -0,0 +1,85 @@
+"""
+Pinigai sveikaisiais centais (int64): sumos tikslios ir greitos, o nukirpimas iki
+centų (ROUND_DOWN, kaip floor2) atliekamas VIENĄ kartą – įkeliant duomenis.
+Į eurus (float) verčiam tik rodymui ir eksportui.
+"""
+from decimal import Decimal, ROUND_DOWN
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+CENTS_EXACT_MAX = 2.0**46  # iki čia gretimi float skiriasi < 0.01 € -> centai vienareikšmiai; didesni (retai) – per Decimal
+INT64_MAX_EUR = np.iinfo(np.int64).max / 100
+
+def _trunc_cents_scalar(v: float) -> int:
+    if not np.isfinite(v) or abs(v) >= INT64_MAX_EUR:
+        return 0
+    return int(Decimal(str(v)).quantize(Decimal("0.01"), rounding=ROUND_DOWN) * 100)
+
+def to_cents(values) -> pd.Series:
+    """
+    Eurai (float) -> int64 centai, nukertant link nulio lygiai kaip
+    float(Decimal(str(x)).quantize(Decimal("0.01"), ROUND_DOWN)).
+    str(x) yra trumpiausias x atvaizdas, todėl nukirpti iki c centų galima tada ir tik tada,
+    kai float(c/100) <= |x|: imam floor(|x|*100) ir pataisom ±1 dėl daugybos paklaidos.
+    NaN / inf -> 0.
+    """
+    s = values if isinstance(values, pd.Series) else pd.Series(values)
+    if pd.api.types.is_integer_dtype(s):
+        return s.astype("int64") * 100
+    x = np.asarray(s, dtype=float)
+    a = np.abs(x)
+    with np.errstate(over="ignore", invalid="ignore"):  # didžiulės reikšmės -> inf; jas tvarko Decimal šaka
+        c = np.floor(a * 100.0)
+    c = np.where((c + 1.0) / 100.0 <= a, c + 1.0, c)
+    c = np.where(c / 100.0 > a, c - 1.0, c)
+    c = np.where(np.isfinite(c), c, 0.0)
+    big = np.isfinite(x) & (a >= CENTS_EXACT_MAX)
+    cents = (np.sign(x, where=np.isfinite(x), out=np.zeros_like(x)) * np.where(big, 0.0, c)).astype(np.int64)
+    if big.any():
+        cents[big] = [_trunc_cents_scalar(v) for v in x[big]]
+    return pd.Series(cents, index=s.index, name=s.name)
+
+# Eurų teksto valymas: viskas, kas ne skaitmuo/taškas/kablelis/minusas, išmetama vienu regex praėjimu
+# (NBSP, tarpai, €, raidės), tada ',' -> '.' ir '\u2212' -> '-'. Lieka tik to_numeric priimama forma.
+_EUR_JUNK_RE = r"[^0-9.,\-\x{2212}]"
+_EUR_NUM_RE = r"^-?(?:[0-9]+\.?[0-9]*|\.[0-9]+)$"
+
+def parse_eur(values) -> pd.Series:
+    """
+    Tekstinės sumos („1 234,56 €“, „\u221212,5“) -> float; neatpažinta -> NaN.
+    Skaitinis stulpelis grąžinamas toks, koks yra (be kelionės per str).
+    Tekstas apdorojamas Arrow compute viename konvejeryje, be tarpinių pandas Series.
+    """
+    s = values if isinstance(values, pd.Series) else pd.Series(values)
+    if pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_bool_dtype(s):
+        return s
+    try:
+        arr = pa.array(s, type=pa.string(), from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        arr = pa.array(s.astype(str), type=pa.string(), from_pandas=True)
+    arr = pc.replace_substring_regex(arr, _EUR_JUNK_RE, "")
+    arr = pc.replace_substring(pc.replace_substring(arr, ",", "."), "\u2212", "-")
+    arr = pc.if_else(pc.match_substring_regex(arr, _EUR_NUM_RE), arr, pa.scalar(None, pa.string()))
+    out = pc.cast(arr, pa.float64()).to_numpy(zero_copy_only=False)
+    return pd.Series(out, index=s.index, name=s.name)
+
+def cents_to_eur(cents) -> pd.Series | float:
+    """int64 centai -> eurai (float) rodymui/eksportui."""
+    if isinstance(cents, pd.Series):
+        return cents.astype("int64") / 100.0
+    return int(cents) / 100.0
+
+def eur_frame(df: pd.DataFrame, cols) -> pd.DataFrame:
+    """Kopija, kurioje nurodyti centų stulpeliai paversti eurais (tik rodymui/eksportui)."""
+    out = df.copy(deep=False)
+    for c in cols:
+        if c in out.columns and pd.api.types.is_integer_dtype(out[c]):
+            out[c] = out[c] / 100.0
+    return out
+
+def is_cents(s: pd.Series) -> bool:
+    """Įkeltuose rinkiniuose sumos centais saugomos kaip int64; float – seni rinkiniai eurais."""
+    return s is not None and pd.api.types.is_integer_dtype(s)
@@ -0,0 +1,63 @@
+"""
+Puslapiuojamos lentelės: paieška ir rikiavimas atliekami serveryje, į naršyklę siunčiamas
+tik matomas puslapis. Dideliems rinkiniams (dešimtys tūkstančių eilučių) serializacija
+į frontend'ą nebedominuoja.
+"""
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+PAGE_SIZES = (50, 100, 250, 500)
+DEFAULT_ORDER = "— numatyta tvarka —"
+
+def _positions(df: pd.DataFrame, query: str, search_cols: tuple, sort_by: tuple, ascending: bool) -> np.ndarray:
+    """Eilučių pozicijos po paieškos (be raidžių dydžio, poeilutė) ir stabilaus rikiavimo."""
+    pos = np.arange(len(df))
+    q = (query or "").strip().lower()
+    if q:
+        mask = np.zeros(len(df), dtype=bool)
+        for c in search_cols:
+            if c in df.columns:
+                mask |= df[c].astype(str).str.lower().str.contains(q, regex=False, na=False).to_numpy()
+        pos = pos[mask]
+    cols = [c for c in sort_by if c in df.columns]
+    if cols and len(pos):
+        sub = df.iloc[pos][cols].reset_index(drop=True)
+        pos = pos[sub.sort_values(cols, ascending=ascending, kind="mergesort").index.to_numpy()]
+    return pos
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def _positions_cached(cache_key: tuple, _df: pd.DataFrame, query: str, search_cols: tuple, sort_by: tuple, ascending: bool):
+    return _positions(_df, query, search_cols, sort_by, ascending)
+
+def paged(df: pd.DataFrame, key: str, search_cols=(), default_sort=(), cache_key: tuple | None = None,
+          page_size: int = PAGE_SIZES[1]) -> pd.DataFrame:
+    """
+    Valdikliai (paieška, rikiavimas, puslapis) + matomas puslapis (originalus indeksas išlieka).
+    cache_key – stabilus df raktas (pvz. versijos ir laikotarpis): tada filtrų/rikiavimo
+    rezultatas imamas iš podėlio, o ne skaičiuojamas kiekvieną kartą.
+    """
+    c1, c2, c3, c4 = st.columns([3, 2, 1, 1])
+    query = c1.text_input("Paieška", key=f"{key}_q", placeholder="Ieškoti…") if search_cols else ""
+    sort_col = c2.selectbox("Rikiuoti pagal", [DEFAULT_ORDER] + list(df.columns), key=f"{key}_sort")
+    ascending = c3.toggle("Didėjančiai", value=True, key=f"{key}_asc")
+    size = c4.selectbox("Eilučių", PAGE_SIZES, index=PAGE_SIZES.index(page_size), key=f"{key}_size")
+
+    sort_by = tuple(default_sort) if sort_col == DEFAULT_ORDER else (sort_col,)
+    args = (query, tuple(search_cols), sort_by, ascending if sort_col != DEFAULT_ORDER else True)
+    pos = _positions_cached(cache_key, df, *args) if cache_key is not None else _positions(df, *args)
+
+    # Pasikeitus filtrams – atgal į pirmą puslapį
+    n_pages = max(1, -(-len(pos) // size))
+    sig = (args, size, len(df))
+    if st.session_state.get(f"{key}_sig") != sig:
+        st.session_state[f"{key}_sig"] = sig
+        st.session_state[f"{key}_page"] = 1
+    page = min(int(st.session_state.get(f"{key}_page", 1)), n_pages)
+    st.session_state[f"{key}_page"] = page
+    if n_pages > 1:
+        page = st.number_input("Puslapis", min_value=1, max_value=n_pages, step=1, key=f"{key}_page")
+    lo = (page - 1) * size
+    st.caption(f"Rodoma {min(lo + 1, len(pos))}–{min(lo + size, len(pos))} iš {len(pos)}"
+               + ("" if len(pos) == len(df) else f" (iš viso {len(df)})"))
+    return df.iloc[pos[lo:lo + size]]
@@ -0,0 +1,113 @@
+"""
+Sutarčių planai – bendra, išliekanti saugykla (SQLite <DATA_DIR>/plans.sqlite) vietoj
+session_state: planai nedingsta atsijungus ir yra bendri visiems vartotojams.
+
+Raktas – normalizuoti (Klientas, SutartiesID) tekstai (ne versijos kodai), suma – centais.
+Rašomos tik pakeistos eilutės; skaitymas per st.cache_data raktuojamas revizija, kurią
+kiekvienas įrašas padidina – todėl podėlis pasensta ir kitoms sesijoms ar procesams.
+"""
+import os
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+import streamlit as st
+
+from core import store
+
+DB_PATH = os.path.join(store.DATA_DIR, "plans.sqlite")
+COLS = ["Klientas", "SutartiesID", "SutartiesPlanas"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS plans (
+    Klientas        TEXT    NOT NULL,
+    SutartiesID     TEXT    NOT NULL,
+    SutartiesPlanas INTEGER NOT NULL,  -- centai
+    updated_at      TEXT    NOT NULL,
+    updated_by      TEXT,
+    PRIMARY KEY (Klientas, SutartiesID)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (k TEXT PRIMARY KEY, v INTEGER NOT NULL);
+INSERT OR IGNORE INTO meta (k, v) VALUES ('revision', 0);
+"""
+_init_lock = threading.Lock()
+_initialized = False
+
+def _connect() -> sqlite3.Connection:
+    """Trumpalaikis prisijungimas (Streamlit sesijos – skirtingose gijose); transakcijos – aiškios."""
+    global _initialized
+    fresh = not os.path.exists(DB_PATH)
+    if fresh:
+        os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
+    con = sqlite3.connect(DB_PATH, timeout=10, isolation_level=None)
+    if fresh or not _initialized:
+        with _init_lock:
+            if fresh or not _initialized:
+                con.execute("PRAGMA journal_mode=WAL")
+                con.executescript(_SCHEMA)
+                _initialized = True
+    return con
+
+def revision() -> int:
+    """Planų revizija – vienas mažas SELECT; ja raktuojamas skaitymo podėlis."""
+    con = _connect()
+    try:
+        return int(con.execute("SELECT v FROM meta WHERE k = 'revision'").fetchone()[0])
+    finally:
+        con.close()
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def _read(rev: int) -> pd.DataFrame:
+    con = _connect()
+    try:
+        df = pd.read_sql_query("SELECT Klientas, SutartiesID, SutartiesPlanas FROM plans", con)
+    finally:
+        con.close()
+    df["SutartiesPlanas"] = df["SutartiesPlanas"].astype("int64")
+    return df
+
+def load(rev: int | None = None) -> pd.DataFrame:
+    """Visi išsaugoti planai (Klientas, SutartiesID, SutartiesPlanas centais)."""
+    return _read(revision() if rev is None else rev)
+
+def save_changes(upserts: pd.DataFrame, deletes: pd.DataFrame | None = None, *, user: str) -> int:
+    """
+    Įrašo pakeistus planus (upserts: COLS) ir pašalina ištrintus (deletes: Klientas, SutartiesID)
+    vienoje transakcijoje. Revizija didinama tik jei kas nors iš tiesų pasikeitė.
+    user – prisijungęs vartotojas (updated_by); be jo neįrašoma (ValueError).
+    Grąžina pakeistų eilučių skaičių.
+    """
+    if not user:
+        raise ValueError("Planus keisti gali tik prisijungęs vartotojas (user nenurodytas).")
+    now = time.strftime("%Y-%m-%dT%H:%M:%S")
+    up = [(str(k), str(s), int(p), now, user) for k, s, p in upserts[COLS].itertuples(index=False)]
+    dl = [] if deletes is None else [(str(k), str(s)) for k, s in deletes[COLS[:2]].itertuples(index=False)]
+    if not up and not dl:
+        return 0
+    con = _connect()
+    try:
+        con.execute("BEGIN IMMEDIATE")
+        before = con.total_changes
+        if up:
+            con.executemany(
+                "INSERT INTO plans (Klientas, SutartiesID, SutartiesPlanas, updated_at, updated_by) "
+                "VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (Klientas, SutartiesID) DO UPDATE SET "
+                "SutartiesPlanas = excluded.SutartiesPlanas, updated_at = excluded.updated_at, "
+                "updated_by = excluded.updated_by "
+                "WHERE plans.SutartiesPlanas <> excluded.SutartiesPlanas",
+                up,
+            )
+        if dl:
+            con.executemany("DELETE FROM plans WHERE Klientas = ? AND SutartiesID = ?", dl)
+        changed = con.total_changes - before
+        if changed:
+            con.execute("UPDATE meta SET v = v + 1 WHERE k = 'revision'")
+        con.execute("COMMIT")
+    except Exception:
+        con.execute("ROLLBACK")
+        raise
+    finally:
+        con.close()
+    return changed
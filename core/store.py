@@ -0,0 +1,310 @@
+"""
+Bendra duomenų saugykla: normalizuoti rinkiniai (sąskaitos, kreditinės) laikomi
+Arrow IPC failuose diske su versijos ID ir kraunami per memory-map – visos sesijos
+dalijasi viena kopija, o ne laiko po savo DataFrame session_state'e.
+
+Išdėstymas:
+    <DATA_DIR>/<rinkinys>/<versija>.arrow
+    <DATA_DIR>/<rinkinys>/<versija>.json         – papildymo versija: bazė + deltų grandinė (žr. append)
+    <DATA_DIR>/<rinkinys>/<versija>.delta.arrow  – papildymo versijos naujos/pakitusios eilutės
+    <DATA_DIR>/<rinkinys>/<versija>.<priedas>.arrow  – iš versijos išvestos lentelės (pvz. indeksai)
+    <DATA_DIR>/<rinkinys>/CURRENT      – dabartinės versijos ID
+"""
+import hashlib
+import json
+import os
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+import pyarrow.feather as feather
+import streamlit as st
+
+from core.keys import norm_keys_exact
+
+DATA_DIR = os.environ.get("SUTARTYS_DATA_DIR", os.path.join(os.path.dirname(os.path.dirname(__file__)), "data"))
+KEEP_VERSIONS = 3  # kiek senų versijų paliekam diske (atviros sesijos gali dar jas skaityti)
+MAX_SEGMENTS = 8   # ilgesnė papildymų grandinė suspaudžiama į pilną versiją
+
+def _kind_dir(kind: str) -> str:
+    return os.path.join(DATA_DIR, kind)
+
+def _path(kind: str, version: str) -> str:
+    return os.path.join(_kind_dir(kind), f"{version}.arrow")
+
+def _manifest_path(kind: str, version: str) -> str:
+    return os.path.join(_kind_dir(kind), f"{version}.json")
+
+def _delta_path(kind: str, version: str) -> str:
+    return os.path.join(_kind_dir(kind), f"{version}.delta.arrow")
+
+def _read_manifest(kind: str, version: str) -> dict | None:
+    """Papildymo versijos aprašas {base, segments, key_col}; pilnai versijai – None."""
+    try:
+        with open(_manifest_path(kind, version), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def chain(kind: str, version: str) -> tuple[str, list] | None:
+    """Papildymo versijai – (bazinė versija, segmentų versijos tvarka); pilnai versijai – None."""
+    m = _read_manifest(kind, version)
+    return None if m is None else (m["base"], list(m["segments"]))
+
+def _exists(kind: str, version: str) -> bool:
+    return os.path.exists(_path(kind, version)) or os.path.exists(_manifest_path(kind, version))
+
+def current_version(kind: str) -> str | None:
+    """Dabartinės versijos ID arba None, jei rinkinys dar neįrašytas."""
+    try:
+        with open(os.path.join(_kind_dir(kind), "CURRENT"), "r", encoding="utf-8") as f:
+            v = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return v if v and _exists(kind, v) else None
+
+def version_tag(version: str | None) -> str:
+    """Versijos ID = <laikas>_<žymė>; žymė – pvz. įkelto failo turinio hash."""
+    return "" if not version else version.split("_", 1)[-1]
+
+def _write_arrow(path: str, df: pd.DataFrame):
+    """Atominis įrašymas: pirma į .tmp, po to os.replace (skaitytojai niekada nemato pusės failo)."""
+    tmp = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.{uuid.uuid4().hex}.tmp")
+    feather.write_feather(df.reset_index(drop=True), tmp, compression="uncompressed")
+    os.replace(tmp, path)
+
+def _new_version(kind: str, tag: str) -> str:
+    os.makedirs(_kind_dir(kind), exist_ok=True)
+    return f"{time.strftime('%Y%m%dT%H%M%S')}_{(tag or uuid.uuid4().hex)[:16]}"
+
+def _publish(kind: str, version: str):
+    """Padaro versiją dabartine (atomiškai perrašomas CURRENT) ir išvalo senas."""
+    d = _kind_dir(kind)
+    ptr_tmp = os.path.join(d, f".CURRENT.{uuid.uuid4().hex}.tmp")
+    with open(ptr_tmp, "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(ptr_tmp, os.path.join(d, "CURRENT"))
+    _prune(kind, keep=version)
+
+def save(kind: str, df: pd.DataFrame, tag: str = "") -> str:
+    """Įrašo rinkinį kaip naują versiją (nesuspaustas Arrow -> tinka memory-map) ir ją padaro dabartine."""
+    version = _new_version(kind, tag)
+    _write_arrow(_path(kind, version), df)
+    _publish(kind, version)
+    return version
+
+def _prune(kind: str, keep: str):
+    """Palieka KEEP_VERSIONS naujausių versijų ir viską, kuo jų deltų grandinės remiasi (bazę, segmentus)."""
+    files = os.listdir(_kind_dir(kind))
+    versions = sorted(f.rsplit(".", 1)[0] for f in files if f.endswith((".arrow", ".json")) and f.count(".") == 1)
+    others = [v for v in versions if v != keep]
+    kept = [keep] + (others[-(KEEP_VERSIONS - 1):] if KEEP_VERSIONS > 1 else [])
+    needed = set(kept)
+    for v in kept:
+        m = _read_manifest(kind, v)
+        if m is not None:
+            needed.add(m["base"])
+            needed.update(m["segments"])
+    old = [v for v in versions if v not in needed]
+    for f in files:
+        if any(f.startswith(f"{v}.") for v in old):
+            try:
+                os.remove(os.path.join(_kind_dir(kind), f))
+            except OSError:
+                pass
+
+# =================== Priedai (iš versijos išvestos lentelės) ===================
+def _sidecar_path(kind: str, version: str, name: str) -> str:
+    return os.path.join(_kind_dir(kind), f"{version}.{name}.arrow")
+
+def save_sidecar(kind: str, version: str, name: str, df: pd.DataFrame):
+    """Išsaugo versijai priklausančią išvestinę lentelę (ištrinama kartu su versija)."""
+    _write_arrow(_sidecar_path(kind, version, name), df)
+
+def load_sidecar(kind: str, version: str, name: str) -> pd.DataFrame | None:
+    path = _sidecar_path(kind, version, name)
+    if not os.path.exists(path):
+        return None
+    return feather.read_table(path, memory_map=True).to_pandas(split_blocks=True)
+
+def _read_arrow(path: str) -> pd.DataFrame:
+    # memory_map: skaitiniai stulpeliai be kopijavimo remiasi į failo puslapius
+    return feather.read_table(path, memory_map=True).to_pandas(split_blocks=True)
+
+def apply_segments(frames, key_col: str = "Saskaitos_NR") -> pd.DataFrame:
+    """
+    Bazė + deltų segmentai (tvarka svarbi) -> rinkinys. Segmente yra tik nauji ir pakitę dokumentai
+    (visos jų eilutės), todėl dokumentas imamas iš PASKUTINIO jį turinčio segmento; eilutės be rakto – visos.
+    """
+    df = pd.concat(frames, ignore_index=True)
+    src = np.repeat(np.arange(len(frames)), [len(f) for f in frames])
+    keys = norm_keys_exact(df[key_col]).to_numpy()
+    has_key = keys != ""
+    keep = ~has_key
+    last = pd.Series(src[has_key]).groupby(keys[has_key]).transform("max").to_numpy()
+    keep[has_key] = src[has_key] == last
+    return df.loc[keep].reset_index(drop=True)
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def _load(kind: str, version: str) -> pd.DataFrame:
+    m = _read_manifest(kind, version)
+    if m is None:
+        return _read_arrow(_path(kind, version))
+    frames = [_read_arrow(_path(kind, m["base"]))] + [_read_arrow(_delta_path(kind, s)) for s in m["segments"]]
+    return apply_segments(frames, m["key_col"])
+
+def load(kind: str, version: str) -> pd.DataFrame:
+    """
+    Konkreti versija. Grąžinam seklią kopiją: bendras DataFrame dalijamas tarp sesijų,
+    o puslapiai stulpelius tik perrašo (df[c] = ...), todėl jo turinys nekinta.
+    """
+    return _load(kind, version).copy(deep=False)
+
+def load_current(kind: str):
+    """(DataFrame, versija) arba (None, None), jei rinkinio dar nėra."""
+    v = current_version(kind)
+    if v is None:
+        return None, None
+    return load(kind, v), v
+
+# =================== Papildymas (append) su deduplikacija ===================
+# Versijos dokumentų antspaudai laikomi priede (doc_fp_<stulpeliai>; papildymo segmentui – tik jo
+# dokumentų, doc_fp_<stulpeliai>_seg): papildymas lygina tik naujo failo eilutes su jais, o ne
+# perhash'ina visą istoriją. Priedo vardas priklauso nuo lyginamų stulpelių – pasikeitus jų
+# rinkiniui, antspaudai (vieną kartą) perskaičiuojami.
+FP_SIDECAR = "doc_fp"
+
+def _row_hashes(df: pd.DataFrame, cols) -> np.ndarray:
+    d = df[cols].copy()
+    for c in cols:
+        if pd.api.types.is_datetime64_any_dtype(d[c]):
+            d[c] = d[c].astype("datetime64[ns]")  # skirtingas laiko vienetas neturi reikšti „pasikeitė“
+    return pd.util.hash_pandas_object(d, index=False).to_numpy()
+
+def _doc_fingerprints(keys: pd.Series, hashes: np.ndarray) -> pd.DataFrame:
+    """Dokumento (rakto) antspaudas = eilučių hash suma + eilučių skaičius; eilučių tvarka nesvarbi."""
+    g = pd.DataFrame({"k": keys.to_numpy(), "h": hashes}).groupby("k", sort=False)["h"]
+    return pd.DataFrame({"h": g.sum(), "n": g.size()})
+
+def fingerprints(df: pd.DataFrame, cols, key_col: str = "Saskaitos_NR"):
+    """
+    (dokumentų antspaudai [indeksas k; h, n], eilučių be rakto hash'ai, raktai kiekvienai eilutei).
+    """
+    keys = norm_keys_exact(df[key_col])
+    h = _row_hashes(df, cols)
+    has_key = (keys != "").to_numpy()
+    return _doc_fingerprints(keys[has_key], h[has_key]), h[~has_key], keys
+
+def _fp_name(cols) -> str:
+    return f"{FP_SIDECAR}_{hashlib.sha1('|'.join(map(str, cols)).encode('utf-8')).hexdigest()[:8]}"
+
+def _save_fingerprints(kind: str, version: str, name: str, fp: pd.DataFrame, nokey: np.ndarray):
+    save_sidecar(kind, version, name, fp.rename_axis("k").reset_index())
+    save_sidecar(kind, version, f"{name}_nokey", pd.DataFrame({"h": nokey}))
+
+def _load_fingerprints(kind: str, version: str, name: str):
+    fp = load_sidecar(kind, version, name)
+    nokey = load_sidecar(kind, version, f"{name}_nokey")
+    if fp is None or nokey is None:
+        return None
+    return fp.set_index("k")[["h", "n"]], nokey["h"].to_numpy()
+
+def version_fingerprints(kind: str, version: str, cols, key_col: str = "Saskaitos_NR"):
+    """
+    Versijos antspaudai: (fp, eilučių be rakto hash'ai). Pilnai versijai – iš jos priedo,
+    papildymo versijai – bazės antspaudai + segmentų antspaudai (vėlesnis dokumentas perrašo ankstesnį).
+    Jei priedų trūksta (senesnė versija ar kiti stulpeliai) – suskaičiuojami iš versijos VIENĄ kartą ir įrašomi.
+    """
+    name = _fp_name(cols)
+    got = _load_fingerprints(kind, version, name)
+    if got is not None:
+        return got
+    m = _read_manifest(kind, version)
+    if m is not None:
+        segs = [_load_fingerprints(kind, s, f"{name}_seg") for s in m["segments"]]
+        if all(g is not None for g in segs):
+            fp, nokey = version_fingerprints(kind, m["base"], cols, key_col)
+            fp = pd.concat([fp] + [g[0] for g in segs])
+            return fp[~fp.index.duplicated(keep="last")], np.concatenate([nokey] + [g[1] for g in segs])
+    fp, nokey, _ = fingerprints(load(kind, version), cols, key_col)
+    _save_fingerprints(kind, version, name, fp, nokey)
+    return fp, nokey
+
+def diff_delta(new: pd.DataFrame, old_fp, cols, key_col: str = "Saskaitos_NR"):
+    """
+    Palygina naują rinkinį su esamo antspaudais (old_fp = (fp, eilučių be rakto hash'ai)) pagal
+    norm_key_exact(key_col), dokumento lygiu: nauji ir pasikeitę dokumentai (visos jų eilutės) patenka
+    į deltą, nepakitę – ne; eilutės be rakto – tik jei tokios pačios eilutės dar nėra.
+    cols – lyginami stulpeliai (be kilmės ir pan.). Esamo rinkinio eilutės nereikalingos.
+    Grąžina (delta, statistika, (deltos dokumentų fp, deltos eilučių be rakto hash'ai)).
+    """
+    fp_old, old_nokey = old_fp
+    fp_new, new_nokey, new_keys = fingerprints(new, cols, key_col)
+
+    has_key = (new_keys != "").to_numpy()
+    both = fp_new.join(fp_old, how="inner", rsuffix="_old")
+    unchanged = both.index[(both["h"] == both["h_old"]) & (both["n"] == both["n_old"])]
+    changed = both.index.difference(unchanged)
+
+    take = has_key & ~new_keys.isin(unchanged).to_numpy()
+    nokey_take = ~np.isin(new_nokey, old_nokey)
+    take[~has_key] = nokey_take
+    delta = new.loc[take]
+    stats = {
+        "naujų dok.": int(len(fp_new.index.difference(fp_old.index))),
+        "pakeistų dok.": int(len(changed)),
+        "nepakitusių dok.": int(len(unchanged)),
+        "įrašyta eilučių": int(len(delta)),
+    }
+    return delta, stats, (fp_new.drop(index=unchanged), new_nokey[nokey_take])
+
+def _columns(kind: str, version: str) -> list:
+    """Versijos stulpeliai iš Arrow schemų (duomenys neskaitomi)."""
+    m = _read_manifest(kind, version)
+    paths = [_path(kind, version)] if m is None else \
+        [_path(kind, m["base"])] + [_delta_path(kind, s) for s in m["segments"]]
+    cols = []
+    for p in paths:
+        cols += [c for c in feather.read_table(p, memory_map=True).schema.names if c not in cols]
+    return cols
+
+def append(kind: str, new: pd.DataFrame, tag: str = "", key_col: str = "Saskaitos_NR", ignore_cols=()):
+    """
+    Papildo dabartinę rinkinio versiją nauju failu. Jei nieko naujo – versijos nekuria.
+    Lyginama su dabartinės versijos antspaudais (ne su istorijos eilutėmis), o diske įrašoma tik delta:
+    nauja versija = aprašas (bazė + ankstesni segmentai + šis) ir šio segmento eilutės bei antspaudai –
+    įrašymo kaina proporcinga deltai, ne istorijai. Segmentai sujungiami skaitant (apply_segments);
+    grandinei pasiekus MAX_SEGMENTS, įrašoma pilna (suspausta) versija.
+    Grąžina (versija, statistika, delta) – delta leidžia išvestinius indeksus atnaujinti inkrementiškai.
+    """
+    version = current_version(kind)
+    if version is None:
+        return save(kind, new, tag=tag), {"naujų dok.": int(new[key_col].nunique()), "įrašyta eilučių": int(len(new))}, new
+    existing_cols = _columns(kind, version)
+    cols = [c for c in new.columns if c in existing_cols and c not in ignore_cols]
+    name = _fp_name(cols)
+    old_fp = version_fingerprints(kind, version, cols, key_col)
+    delta, stats, (fp_delta, nokey_delta) = diff_delta(new, old_fp, cols, key_col)
+    if delta.empty:
+        return version, stats, delta
+
+    m = _read_manifest(kind, version) or {"base": version, "segments": []}
+    if len(m["segments"]) + 1 >= MAX_SEGMENTS:
+        # Suspaudimas: pilna versija ir pilni antspaudai (retai – kas MAX_SEGMENTS papildymų)
+        new_version = save(kind, apply_segments([load(kind, version), delta], key_col), tag=tag)
+        fp = pd.concat([old_fp[0], fp_delta])
+        _save_fingerprints(kind, new_version, name, fp[~fp.index.duplicated(keep="last")],
+                           np.concatenate([old_fp[1], nokey_delta]))
+        return new_version, stats, delta
+
+    new_version = _new_version(kind, tag)
+    _write_arrow(_delta_path(kind, new_version), delta)
+    _save_fingerprints(kind, new_version, f"{name}_seg", fp_delta, nokey_delta)
+    manifest = {"base": m["base"], "segments": m["segments"] + [new_version], "key_col": key_col}
+    tmp = os.path.join(_kind_dir(kind), f".{new_version}.json.{uuid.uuid4().hex}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp, _manifest_path(kind, new_version))
+    _publish(kind, new_version)
+    return new_version, stats, delta
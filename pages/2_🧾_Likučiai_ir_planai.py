@@ -1,14 +1,34 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-from io import BytesIO
 from decimal import Decimal, ROUND_DOWN
 from datetime import date
 import re
+import hashlib
+from functools import partial
+
+from core import auth
+from core import store
+from core import invoice_index
+from core import plans as plan_store
+from core import jobs
+from core.keys import extract_invoice_refs
+from core.rollup import DailyRollup
+from core.contracts import CODE, ContractDict, factorize_contracts, norm_key_col, norm_keys
+from core.paging import paged
+from core.exports import EXPORT_FORMATS, export_bytes, fits_xlsx
+from core.money import parse_eur, to_cents, cents_to_eur, eur_frame, is_cents
+
+# Pinigų stulpeliai – puslapyje visur int64 centai, eurais tik rodant/eksportuojant
+MONEY_COLS = ["Suma_su_PVM", "SutartiesPlanas", "Israsyta", "Kredituota", "Faktas", "Like"]
+JOB_WAIT_S = 0.5  # tiek palaukiam foninės užduoties, kad greiti skaičiavimai neblykstelėtų eigos juosta
 
 # =================== Puslapio nustatymas ===================
 st.set_page_config(layout="wide")
 
+# Duomenys bendri visam serveriui – be prisijungimo puslapis nerodomas (atidarius ir tiesiogiai pagal URL)
+auth_user = auth.require_login()
+
 # Kompaktesnis išdėstymas + prisitaikanti antraštė (visada tilps)
 st.markdown("""
 <style>
@@ -53,9 +73,6 @@ def floor2(x):
     except Exception:
         return 0.0
 
-def ensure_df(src):
-    return src if isinstance(src, pd.DataFrame) else None
-
 def get_min_max_date(*dfs):
     dates = pd.concat([d["Data"] for d in dfs if d is not None and "Data" in d.columns], axis=0) if any(d is not None for d in dfs) else pd.Series([], dtype="datetime64[ns]")
     dates = pd.to_datetime(dates, errors="coerce").dropna()
@@ -79,22 +96,7 @@ def parse_eur_robust(series):
     if series is None or isinstance(series, (int, float)):
         # Jei gautas ne Series, grąžinam tuščią seriją; kvietėjas užpildys 0.0
         return pd.Series(dtype=float)
-    s = series.astype(str)
-    s = s.str.replace('\u2212', '-', regex=False)  # minus
-    s = s.str.replace('\u00A0', '', regex=False)   # non-breaking space
-    s = s.str.replace(' ', '', regex=False)
-    s = s.str.replace('€', '', regex=False)
-    s = s.str.replace(',', '.', regex=False)
-    s = s.str.replace(r'[^0-9\.\-]', '', regex=True)
-    return pd.to_numeric(s, errors='coerce')
-
-def amount_from_F(df: pd.DataFrame) -> pd.Series:
-    """Fallback: 6-tas stulpelis, jei nieko kito neradom (senas variantas)."""
-    if df is None or df.empty:
-        return pd.Series([], dtype=float)
-    if df.shape[1] >= 6:
-        return parse_eur_robust(df.iloc[:, 5]).fillna(0.0)
-    return pd.Series([0.0] * len(df), index=df.index, dtype=float)
+    return parse_eur(series)
 
 def normalize_headers(df: pd.DataFrame):
     cols_orig = list(df.columns)
@@ -119,55 +121,49 @@ def detect_currency_col_idx_content(df: pd.DataFrame, currency: str = "EUR"):
             best_idx, best_count = i, cnt
     return best_idx if best_count > 0 else None
 
-def credit_amounts_by_header_logic(df: pd.DataFrame) -> pd.Series:
-    """Randa sumų stulpelį šalia 'EUR' antraštės."""
-    if df is None or df.empty:
-        return pd.Series([], dtype=float)
+def amount_idx_by_header_logic(df: pd.DataFrame):
+    """Randa sumų stulpelio poziciją šalia 'EUR' antraštės (arba None)."""
     _, cols_norm = normalize_headers(df)
-    amount_idx = None
     eur_idx = detect_currency_col_idx_headers(df, "EUR")
     if eur_idx is not None and eur_idx - 1 >= 0:
-        amount_idx = eur_idx - 1
-    if amount_idx is None:
-        for i in range(len(cols_norm) - 1):
-            if cols_norm[i + 1] == "EUR":
-                trial = parse_eur_robust(df.iloc[:, i]).fillna(0.0)
-                if trial.abs().sum() > 0:
-                    amount_idx = i
-                    break
-    if amount_idx is None:
-        return pd.Series(0.0, index=df.index, dtype=float)
-    return parse_eur_robust(df.iloc[:, amount_idx]).fillna(0.0)
-
-def compute_credit_amounts(df: pd.DataFrame) -> pd.Series:
-    """Aptinka kreditinės sumos stulpelį (SU PVM)."""
+        return eur_idx - 1
+    for i in range(len(cols_norm) - 1):
+        if cols_norm[i + 1] == "EUR":
+            trial = parse_eur_robust(df.iloc[:, i]).fillna(0.0)
+            if trial.abs().sum() > 0:
+                return i
+    return None
+
+def _has_amounts(df: pd.DataFrame, idx) -> bool:
+    return idx is not None and bool(parse_eur_robust(df.iloc[:, idx]).fillna(0.0).abs().sum() > 0)
+
+def pick_amount_col_idx(df: pd.DataFrame):
+    """Nusprendžia, kuriame stulpelyje kreditinės sumos (SU PVM); grąžina poziciją arba None.
+    Tvarka ta pati kaip visada: žinomi pavadinimai → šalia 'EUR' antraštės → šalia 'EUR' turinio
+    → 6-tas stulpelis → heuristika „panašus į sumas“."""
     if df is None or df.empty:
-        return pd.Series([], dtype=float)
+        return None
+    cols = list(df.columns)
     for col in ["Suma_su_PVM", "Suma", "SUM SU PVM", "SUM"]:
-        if col in df.columns:
-            s = parse_eur_robust(df[col]).fillna(0.0)
-            if s.abs().sum() > 0:
-                return s
-    s = credit_amounts_by_header_logic(df)
-    if s.abs().sum() > 0:
-        return s
+        if col in df.columns and _has_amounts(df, cols.index(col)):
+            return cols.index(col)
+    idx = amount_idx_by_header_logic(df)
+    if _has_amounts(df, idx):
+        return idx
     eur_idx = detect_currency_col_idx_content(df, "EUR")
-    if eur_idx is not None and eur_idx - 1 >= 0:
-        s = parse_eur_robust(df.iloc[:, eur_idx - 1]).fillna(0.0)
-        if s.abs().sum() > 0:
-            return s
-    s = amount_from_F(df)
-    if s.abs().sum() > 0:
-        return s
+    if eur_idx is not None and eur_idx - 1 >= 0 and _has_amounts(df, eur_idx - 1):
+        return eur_idx - 1
+    if df.shape[1] >= 6 and _has_amounts(df, 5):
+        return 5
     # Heuristika: rinktis „panašų į sumas“ stulpelį
-    best_series = None
+    best_idx = None
     best_score = (-1, -1.0)
     skip = {"DATA", "PASTABOS", "KLIENTAS", "SASKAITOS_NR", "TIPAS"}
     _, cols_norm = normalize_headers(df)
-    for i, c in enumerate(df.columns):
+    for i in range(df.shape[1]):
         if cols_norm[i] in skip:
             continue
-        ser = parse_eur_robust(df[c]).fillna(np.nan)
+        ser = parse_eur_robust(df.iloc[:, i])
         nn = ser.notna().sum()
         if nn == 0:
             continue
@@ -177,10 +173,44 @@ def compute_credit_amounts(df: pd.DataFrame) -> pd.Series:
         score = (nn, med)
         if score > best_score:
             best_score = score
-            best_series = ser
-    if best_series is not None:
-        return best_series.fillna(0.0)
-    return pd.Series(0.0, index=df.index, dtype=float)
+            best_idx = i
+    return best_idx
+
+def compute_credit_amounts(df: pd.DataFrame) -> pd.Series:
+    """Aptinka kreditinės sumos stulpelį (SU PVM) pilname rinkinyje."""
+    if df is None or df.empty:
+        return pd.Series([], dtype=float)
+    idx = pick_amount_col_idx(df)
+    if idx is None:
+        return pd.Series(0.0, index=df.index, dtype=float)
+    return parse_eur_robust(df.iloc[:, idx]).fillna(0.0)
+
+# Sprendimas priimamas iš imties ir įsimenamas pagal schemos „pirštų atspaudą“ (antraštės + dtype),
+# todėl kitam to paties formato įkėlimui lieka išparsinti vieną stulpelį, ne visus.
+SCHEMA_SAMPLE_ROWS = 5_000
+
+def schema_fingerprint(df: pd.DataFrame) -> str:
+    sig = repr([(str(c), str(t)) for c, t in zip(df.columns, df.dtypes)])
+    return hashlib.sha1(sig.encode("utf-8")).hexdigest()
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def detect_amount_col_idx(fingerprint: str, _sample: pd.DataFrame):
+    return pick_amount_col_idx(_sample)
+
+def credit_amounts(df: pd.DataFrame) -> pd.Series:
+    """Kreditinės sumos: stulpelis parenkamas vieną kartą schemai, parsinamas tik jis."""
+    if df is None or df.empty:
+        return pd.Series([], dtype=float)
+    n = len(df)
+    # Tolygiai per visą rinkinį, ne tik pradžia – kad tušti pirmi puslapiai nesuklaidintų
+    pos = np.unique(np.linspace(0, n - 1, min(n, SCHEMA_SAMPLE_ROWS)).astype(np.int64))
+    idx = detect_amount_col_idx(schema_fingerprint(df), df.iloc[pos])
+    if idx is not None and idx < df.shape[1]:
+        s = parse_eur_robust(df.iloc[:, idx]).fillna(0.0)
+        if s.abs().sum() > 0:
+            return s
+    # Imties sprendimas šiam rinkiniui netiko (pvz. stulpelis tuščias) – pilna paieška
+    return compute_credit_amounts(df)
 
 def norm_alnum(x: str) -> str:
     if pd.isna(x):
@@ -195,60 +225,24 @@ def only_digits(x: str) -> str:
         return ""
     return re.sub(r"[^0-9]", "", str(x))
 
-# --- VS/AAA ekstraktorius: tikslus, be bendro fallback ---
-def extract_first_invoice_from_notes(text: str) -> str:
-    """Grąžina pirmą VS/AAA numerį iš Pastabų (pvz., VS-241951, VS 241951, VS241951, VS-241951/1; AAA analogiškai)."""
-    if pd.isna(text) or text is None:
-        return ""
-    s = str(text)
-    m = re.search(r'\b(VS[-\s]?\d+(?:/\d+)?)\b', s, flags=re.IGNORECASE)
-    if m:
-        return m.group(1).upper()
-    m = re.search(r'\b(AAA[-\s]?\d+(?:/\d+)?)\b', s, flags=re.IGNORECASE)
-    if m:
-        return m.group(1).upper()
-    return ""
-
-def norm_key_exact(s: str) -> str:
-    """A-Z0-9 raktas (šalinami tarpai/skyryba); „VS-241951/1“ → „VS2419511“."""
-    if pd.isna(s) or s is None or s == "":
-        return ""
-    s = str(s).upper().replace("\u00A0", " ").replace("–", "-").replace("—", "-")
-    s = re.sub(r"\s+", "", s)
-    return re.sub(r"[^A-Z0-9]", "", s)
-
-def norm_key_digits(s: str) -> str:
-    """Tik skaitmenys – „VS-241951/1“ → „2419511“."""
-    if pd.isna(s) or s is None or s == "":
-        return ""
-    return re.sub(r"[^0-9]", "", str(s))
-
 CREDIT_PREFIXES = ("COP", "KRE", "AAA")  # Kreditinių numerių prefiksų atpažinimas (nebūtina keisti)
 CREDIT_RE = re.compile(r'^(?:' + '|'.join(CREDIT_PREFIXES) + r')[\s\-]*', re.IGNORECASE)
 def is_credit_number(x: str) -> bool:
     return isinstance(x, str) and bool(CREDIT_RE.match(x.strip()))
 
-def _norm_key_cols(df: pd.DataFrame, keys=("Klientas","SutartiesID")) -> pd.DataFrame:
-    for k in keys:
-        if k not in df.columns:
-            df[k] = ""
-        df[k] = df[k].apply(lambda v: "" if pd.isna(v) else str(v)).str.strip()
-    return df
-
-# =================== Įkelti duomenys ===================
-inv = ensure_df(st.session_state.get("inv_norm"))
-crn_raw = ensure_df(st.session_state.get("crn_norm"))
+# =================== Skaičiavimo etapai (podėlis) ===================
+# Kiekvienas etapas raktuojamas tik savo tikrais įvesties duomenimis (rinkinio versija,
+# laikotarpis), todėl plano langelio redagavimas jų neperskaičiuoja – lieka tik „out“
+# sujungimas ir KPI. cache_resource objektai bendri visoms sesijoms: jų NEKEIČIAM vietoje.
+# Sutartys etapuose – sveikieji kodai (core.contracts): groupby/merge eina per juos, o
+# (Klientas, SutartiesID) tekstai atkuriami tik rodymui.
 
-if inv is None:
-    st.warning("Įkelk **išrašytas sąskaitas** (sesijos raktas `inv_norm`) skiltyje **📥 Įkėlimas**.")
-    st.stop()
-
-# Bendra sanitarija
-for df in [inv, crn_raw] if crn_raw is not None else [inv]:
+def _sanitize(df: pd.DataFrame):
+    """Bendra sanitarija (vietoje, tik etapų viduje ant seklios kopijos)."""
     if "Data" in df.columns:
         df["Data"] = pd.to_datetime(df["Data"], errors="coerce")
     if "Klientas" in df.columns:
-        df["Klientas"] = df["Klientas"].astype(str).str.strip()
+        df["Klientas"] = norm_key_col(df["Klientas"])  # NaN -> "" (kaip SutartiesID), ne NaN raktas
     if "Saskaitos_NR" in df.columns:
         df["Saskaitos_NR"] = df["Saskaitos_NR"].astype(str).str.strip().str.upper()
     if "Pastabos" in df.columns:
@@ -256,32 +250,195 @@ for df in [inv, crn_raw] if crn_raw is not None else [inv]:
     if "SutartiesID" not in df.columns:
         df["SutartiesID"] = ""
     else:
-        df["SutartiesID"] = df["SutartiesID"].apply(lambda v: "" if pd.isna(v) else str(v)).str.strip()
-
-# Išrašytų sumos (SU PVM) – saugesnis nustatymas
-if "Suma_su_PVM" in inv.columns:
-    inv["Suma_su_PVM"] = parse_eur_robust(inv["Suma_su_PVM"]).fillna(0.0)
-elif "Suma" in inv.columns:
-    inv["Suma_su_PVM"] = parse_eur_robust(inv["Suma"]).fillna(0.0)
-else:
-    inv["Suma_su_PVM"] = 0.0
-
-# Kreditinių pasiruošimas (sumos ir filtrai)
-if crn_raw is not None:
-    crn = crn_raw.copy()
+        df["SutartiesID"] = norm_key_col(df["SutartiesID"])
+
+@st.cache_resource(max_entries=4, show_spinner="Ruošiamos sąskaitos…")
+def prepare_inv(inv_ver: str) -> pd.DataFrame:
+    inv = store.load("inv_norm", inv_ver)
+    _sanitize(inv)
+    # Išrašytų sumos (SU PVM) – sveikais centais; įkėlimas jau saugo int64 centus, senesni rinkiniai – eurais
+    if "Suma_su_PVM" in inv.columns and is_cents(inv["Suma_su_PVM"]):
+        pass
+    elif "Suma_su_PVM" in inv.columns:
+        inv["Suma_su_PVM"] = to_cents(parse_eur_robust(inv["Suma_su_PVM"]))
+    elif "Suma" in inv.columns:
+        inv["Suma_su_PVM"] = to_cents(parse_eur_robust(inv["Suma"]))
+    else:
+        inv["Suma_su_PVM"] = 0
+    inv[CODE], _ = factorize_contracts(inv["Klientas"], inv["SutartiesID"])
+    return inv
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def contract_dict(inv_ver: str) -> ContractDict:
+    """Versijos sutarčių žodynas (kodai – tie patys, kaip prepare_inv stulpelyje Kodas)."""
+    inv = prepare_inv(inv_ver)
+    return ContractDict(inv[[CODE, "Klientas", "SutartiesID"]].drop_duplicates(CODE).sort_values(CODE))
+
+@st.cache_resource(max_entries=4, show_spinner="Ruošiamos kreditinės…")
+def prepare_crn(crn_ver: str) -> pd.DataFrame:
+    """Kreditinių pasiruošimas (sumos ir filtrai)."""
+    crn = store.load("crn_norm", crn_ver)
+    _sanitize(crn)
     if "Tipas" in crn.columns:
         mask_credit = crn["Tipas"].astype(str).str.lower().str.contains("kredit")
         crn = crn.loc[mask_credit].copy()
     else:
         if "Saskaitos_NR" in crn.columns:
             crn = crn.loc[crn["Saskaitos_NR"].astype(str).apply(is_credit_number)].copy()
-    crn["Suma_su_PVM"] = compute_credit_amounts(crn).astype(float).fillna(0.0)
+    # Sveikieji centai jau nukirpti įkeliant; jei jų nėra ar stulpelis visas nulinis
+    # (sumos kitame stulpelyje) – sumų stulpelio ieškom kaip anksčiau
+    stored = crn["Suma_su_PVM"] if "Suma_su_PVM" in crn.columns else None
+    if stored is None or not is_cents(stored) or not stored.any():
+        crn["Suma_su_PVM"] = to_cents(credit_amounts(crn).astype(float).fillna(0.0))
     crn["SutartiesID"] = ""
-else:
-    crn = None
+    return crn
+
+@st.cache_resource(max_entries=4, show_spinner="Kreditinės pririšamos prie sutarčių…")
+def link_credits(inv_ver: str, crn_ver: str) -> pd.DataFrame:
+    """
+    VISŲ kreditinių pririšimas (nepriklauso nuo laikotarpio): iš Pastabų – pirmas VS/AAA numeris,
+    tada exact, o kur nepavyko – digits paieška versijos indekse (core.invoice_index).
+    Pririšta sutartis – Link_Klientas / Link_SutartiesID ir jos kodas Link_Kodas (-1 – nepririšta);
+    kreditinės Klientas lieka savas.
+    """
+    crn = prepare_crn(crn_ver).copy(deep=False)
+    refs = extract_invoice_refs(crn.get("Pastabos", pd.Series(index=crn.index, dtype=object)))
+    linked = invoice_index.get_index(inv_ver).link(refs["Ref_exact"], refs["Ref_digits"])
+    crn["Link_Klientas"] = linked["Klientas"]
+    crn["Link_SutartiesID"] = linked["SutartiesID"]
+    codes = contract_dict(inv_ver).encode(linked["Klientas"], linked["SutartiesID"])
+    crn["Link_" + CODE] = np.where(linked["SutartiesID"].astype(str).str.strip() != "", codes, -1).astype(np.int32)
+    return crn
+
+def _in_period(df: pd.DataFrame, nuo: date, iki: date) -> pd.Series:
+    """Tas pats, kas df["Data"].dt.date.between(nuo, iki), bet be date objektų kiekvienai eilutei."""
+    if "Data" not in df.columns:
+        return pd.Series(True, index=df.index)
+    lo = pd.Timestamp(nuo)
+    hi = pd.Timestamp(iki) + pd.Timedelta(days=1)
+    return (df["Data"] >= lo) & (df["Data"] < hi)
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def date_bounds(inv_ver: str, crn_ver: str | None):
+    return get_min_max_date(prepare_inv(inv_ver), prepare_crn(crn_ver) if crn_ver else None)
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def inv_rollup(inv_ver: str) -> DailyRollup:
+    """Išrašytų dienos suvestinė pagal sutarties kodą (visam rinkiniui, vieną kartą)."""
+    inv = prepare_inv(inv_ver)
+    return DailyRollup(inv[CODE], inv["Data"], inv["Suma_su_PVM"])
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def crn_rollup(inv_ver: str, crn_ver: str) -> DailyRollup:
+    """Kreditinių dienos suvestinė pagal pririštos sutarties kodą (-1 – nepririštos)."""
+    crn = link_credits(inv_ver, crn_ver)
+    return DailyRollup(crn["Link_" + CODE], crn["Data"], crn["Suma_su_PVM"].abs().fillna(0).astype("int64"))
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def period_inv(inv_ver: str, nuo: date, iki: date) -> pd.DataFrame:
+    """Laikotarpio išrašytų eilutės (reikia tik eksportui)."""
+    inv = prepare_inv(inv_ver)
+    return inv.loc[_in_period(inv, nuo, iki)]
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def period_crn(inv_ver: str, crn_ver: str | None, nuo: date, iki: date) -> pd.DataFrame | None:
+    """Laikotarpio kreditinių eilutės; None, jei kreditinių rinkinio nėra."""
+    if crn_ver is None:
+        return None
+    crn = link_credits(inv_ver, crn_ver)
+    return crn.loc[_in_period(crn, nuo, iki)]
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def period_sums(inv_ver: str, crn_ver: str | None, nuo: date, iki: date):
+    """
+    (inv_sum, crn_sum, pririštų kreditinių kiekis) laikotarpiui – centais, raktas – Kodas.
+    Iš dienos suvestinių: dvi paieškos sutarčiai, eilutės nefiltruojamos.
+    """
+    inv_sum = inv_rollup(inv_ver).between(nuo, iki).rename(columns={"Suma": "Israsyta"})[[CODE, "Israsyta"]]
+
+    crn_all = crn_rollup(inv_ver, crn_ver).between(nuo, iki) if crn_ver is not None else None
+    if crn_all is None or crn_all.empty:
+        return inv_sum, None, 0
+
+    # Sumavimas pagal pririštas sutartis
+    linked = crn_all[crn_all[CODE] >= 0]
+    crn_sum = linked.rename(columns={"Suma": "Kredituota"})[[CODE, "Kredituota"]].reset_index(drop=True)
+    return inv_sum, crn_sum, int(linked["Kiekis"].sum())
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def plans_frame(inv_ver: str, crn_ver: str | None, nuo: date, iki: date, plans_rev: int) -> pd.DataFrame:
+    """Laikotarpio sutartys su išsaugotais planais (centais), rikiuotos pagal raktus."""
+    inv_sum, _, _ = period_sums(inv_ver, crn_ver, nuo, iki)
+    contracts = contract_dict(inv_ver)
+    base = contracts.decode(inv_sum[CODE])
+    base.insert(0, CODE, inv_sum[CODE].to_numpy())
+    saved = plan_store.load(plans_rev)
+    codes = contracts.encode(saved["Klientas"], saved["SutartiesID"])
+    plan = pd.Series(saved["SutartiesPlanas"].to_numpy()[codes >= 0], index=codes[codes >= 0])
+    base["SutartiesPlanas"] = plan.reindex(base[CODE]).fillna(0).astype("int64").to_numpy()
+    return base.sort_values(CODE).reset_index(drop=True)
+
+def prepare_versions(job: jobs.Job, inv_ver: str, crn_ver: str | None):
+    """
+    Foninė užduotis: visi versijos lygio etapai (nepriklauso nuo laikotarpio ir planų) – į
+    bendrus podėlius. Po jos puslapio skriptas tik paima paruoštus rezultatus.
+    """
+    job.report(0.05, "sąskaitos")
+    contract_dict(inv_ver)
+    job.report(0.35, "išrašytų dienos suvestinė")
+    inv_rollup(inv_ver)
+    if crn_ver is not None:
+        job.report(0.5, "kreditinės pririšamos prie sutarčių")
+        link_credits(inv_ver, crn_ver)
+        job.report(0.85, "kreditinių dienos suvestinė")
+        crn_rollup(inv_ver, crn_ver)
+    date_bounds(inv_ver, crn_ver)
+    return inv_ver, crn_ver
+
+def plan_edits(shown: pd.DataFrame, state) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    data_editor būsenos skirtumai -> (upserts, deletes) planų saugyklai.
+    Eilutės pozicija būsenoje = eilutės pozicija `shown` (redaktoriui paduota lentelė).
+    """
+    empty = shown.iloc[:0][plan_store.COLS]
+    if not state:
+        return empty, empty
+    edited = {int(i): v["SutartiesPlanas"] for i, v in state.get("edited_rows", {}).items()
+              if "SutartiesPlanas" in v and int(i) < len(shown)}
+    up = shown.iloc[list(edited)][plan_store.COLS].copy()
+    up["SutartiesPlanas"] = to_cents(pd.to_numeric(pd.Series(list(edited.values()), index=up.index, dtype=object), errors="coerce")).to_numpy()
+    up = up[up["SutartiesPlanas"] != shown.loc[up.index, "SutartiesPlanas"]]
+    deleted = [int(i) for i in state.get("deleted_rows", []) if int(i) < len(shown)]
+    dl = shown.iloc[deleted]
+    return up, dl[dl["SutartiesPlanas"] != 0][plan_store.COLS]
+
+# =================== Įkelti duomenys ===================
+# Bendra saugykla (core.store): visos sesijos dalijasi ta pačia memory-map'inta kopija
+inv_ver = store.current_version("inv_norm")
+crn_ver = store.current_version("crn_norm")
+
+if inv_ver is None:
+    st.warning("Įkelk **išrašytas sąskaitas** (rinkinys `inv_norm`) skiltyje **📥 Įkėlimas**.")
+    st.stop()
+
+# Sunkūs versijos etapai – fone (core.jobs): ta pati versijų pora skaičiuojama vieną kartą visoms
+# sesijoms, o kol ji ruošiama – rodomas paskutinis geras rezultatas (jei jo nėra – tik eiga)
+runner = jobs.runner()
+prep = runner.submit(("likuciai", inv_ver, crn_ver), partial(prepare_versions, inv_ver=inv_ver, crn_ver=crn_ver),
+                     label="Duomenys ruošiami", group="likuciai")
+if not prep.wait(JOB_WAIT_S):
+    jobs.show_progress(prep)
+    last = runner.last_good("likuciai")
+    if last is None:
+        st.stop()
+    inv_ver, crn_ver = last.result
+    st.info(f"Rodomi ankstesnės duomenų versijos (`{inv_ver}`) rezultatai – nauji duomenys ruošiami fone.")
+elif prep.error is not None:
+    st.error(f"Nepavyko paruošti duomenų: {prep.error}")
+    st.stop()
 
 # =================== Laikotarpio filtras ===================
-dmin, dmax = get_min_max_date(inv, crn)
+dmin, dmax = date_bounds(inv_ver, crn_ver)
 st.subheader("📅 Laikotarpio filtras")
 rng = st.date_input(
     "Pasirink laikotarpį (nuo – iki)",
@@ -298,60 +455,51 @@ elif isinstance(rng, date):
 else:
     nuo, iki = dmin.date(), dmax.date()
 
-mask_inv = inv["Data"].dt.date.between(nuo, iki) if "Data" in inv.columns else pd.Series(True, index=inv.index)
-inv_f = inv.loc[mask_inv].copy()
-
-if crn is not None:
-    mask_crn = crn["Data"].dt.date.between(nuo, iki) if "Data" in crn.columns else pd.Series(True, index=crn.index)
-    crn_f = crn.loc[mask_crn].copy()
-else:
-    crn_f = None
+crn_f = period_crn(inv_ver, crn_ver, nuo, iki)
+inv_sum, crn_sum, n_linked = period_sums(inv_ver, crn_ver, nuo, iki)
+contracts = contract_dict(inv_ver)
 
 # =================== Išrašytos sąskaitos ===================
 st.divider()
 st.subheader("📄 Išrašytos sąskaitos (SU PVM)")
 
-inv_sum = (
-    inv_f.groupby(["Klientas", "SutartiesID"], dropna=False)["Suma_su_PVM"]
-    .sum()
-    .rename("Israsyta")
-    .reset_index()
-)
-inv_sum = _norm_key_cols(inv_sum, ("Klientas","SutartiesID"))
-
-# REDAGUOJAMI PLANAI
-if "plans" not in st.session_state:
-    st.session_state["plans"] = pd.DataFrame(columns=["Klientas", "SutartiesID", "SutartiesPlanas"])
-
-base = inv_sum[["Klientas", "SutartiesID"]].drop_duplicates().copy()
-plans_old = st.session_state["plans"][["Klientas", "SutartiesID", "SutartiesPlanas"]] if not st.session_state["plans"].empty else None
-if plans_old is not None and not plans_old.empty:
-    plans = pd.merge(base, plans_old, how="left", on=["Klientas", "SutartiesID"])
-else:
-    plans = base.copy()
-    plans["SutartiesPlanas"] = 0.0
-
-plans["SutartiesPlanas"] = pd.to_numeric(plans["SutartiesPlanas"], errors="coerce").fillna(0.0)
-plans = _norm_key_cols(plans, ("Klientas","SutartiesID"))
+# REDAGUOJAMI PLANAI – iš bendros saugyklos (core.plans), ne iš sesijos
+plans_rev = plan_store.revision()
+shown = plans_frame(inv_ver, crn_ver, nuo, iki, plans_rev)
 
 st.markdown("### ✍️ Įvesk sutarčių planus (SU PVM)")
-plans = st.data_editor(
-    plans.sort_values(["Klientas", "SutartiesID"]).reset_index(drop=True),
+# Redaktoriui – tik matomas puslapis; raktas priklauso nuo puslapio eilučių, kad redagavimo
+# būsenos pozicijos niekada neatsidurtų kitame puslapyje
+page_rows = paged(shown[plan_store.COLS], "plans", search_cols=("Klientas", "SutartiesID"),
+                  cache_key=(inv_ver, crn_ver, nuo, iki, plans_rev))
+page_shown = page_rows.reset_index(drop=True)
+editor_key = f"plans_editor_{hash(tuple(page_rows.index)) & 0xFFFFFFFF:x}"
+edited = st.data_editor(
+    eur_frame(page_shown, ["SutartiesPlanas"]),
     num_rows="dynamic",
     hide_index=True,
     use_container_width=True,
     disabled=False,
-    key="plans_editor",
+    key=editor_key,
     column_config={
         "Klientas": st.column_config.TextColumn(disabled=True),
         "SutartiesID": st.column_config.TextColumn(disabled=True),
         "SutartiesPlanas": st.column_config.NumberColumn("Sutarties suma (planas) €", step=0.01, format="%.2f"),
     },
 )
-plans["Klientas"] = plans["Klientas"].astype(str).str.strip()
-plans["SutartiesID"] = plans["SutartiesID"].astype(str).str.strip()
-plans = _norm_key_cols(plans, ("Klientas","SutartiesID"))
-st.session_state["plans"] = plans
+edited["SutartiesPlanas"] = to_cents(pd.to_numeric(edited["SutartiesPlanas"], errors="coerce"))
+# Visi planai = nematomi puslapiai iš saugyklos + redaguotas puslapis
+plans = norm_keys(pd.concat([shown.drop(index=page_rows.index)[plan_store.COLS], edited], ignore_index=True))
+plans[CODE] = contracts.encode(plans["Klientas"], plans["SutartiesID"])
+plans = plans.sort_values(CODE, kind="mergesort").reset_index(drop=True)
+
+# Į saugyklą – tik redaguotos / ištrintos eilutės, ir tik jei reikšmė iš tiesų kita
+upserts, deletes = plan_edits(page_shown, st.session_state.get(editor_key))
+if len(upserts) or len(deletes):
+    # Po įrašo – iškart perpiešiam: redaktorius gauna naujus duomenis (ir naują būseną)
+    # dar prieš kitą vartotojo pakeitimą, todėl jis nepasimeta
+    if plan_store.save_changes(upserts, deletes, user=auth_user):
+        st.rerun()
 
 # =================== Kreditinių sąrašas (be susiejimo) ===================
 st.divider()
@@ -359,108 +507,59 @@ st.subheader("💳 Kreditinės (SU PVM) – be susiejimo")
 
 if crn_f is None or crn_f.empty:
     st.info("Pasirinktame laikotarpyje **kreditinių nėra**.")
-    total_kred = 0.0
+    total_kred = 0
     cols_crn = []
 else:
-    crn_f["Suma_su_PVM"] = crn_f["Suma_su_PVM"].astype(float).fillna(0.0).apply(floor2)
-    total_kred = float(crn_f["Suma_su_PVM"].sum())
+    total_kred = int(crn_f["Suma_su_PVM"].sum())
     cols_crn = [c for c in ["Data", "Saskaitos_NR", "Klientas", "Pastabos", "Suma_su_PVM", "Tipas"] if c in crn_f.columns]
-    st.dataframe(
-        crn_f[cols_crn].sort_values(["Data","Saskaitos_NR"]) if "Data" in cols_crn else crn_f[cols_crn],
-        use_container_width=True
+    crn_page = paged(
+        crn_f[cols_crn], "crn_list",
+        search_cols=("Saskaitos_NR", "Klientas", "Pastabos"),
+        default_sort=("Data", "Saskaitos_NR") if "Data" in cols_crn else (),
+        cache_key=(inv_ver, crn_ver, nuo, iki),
     )
+    st.dataframe(eur_frame(crn_page, MONEY_COLS), use_container_width=True)
 
 c1, c2 = st.columns(2)
 c1.metric("Kreditinių kiekis", "0" if crn_f is None else f"{len(crn_f)}")
-c2.metric("Kreditinių suma (SU PVM)", f"{total_kred:,.2f} €")
+c2.metric("Kreditinių suma (SU PVM)", f"{cents_to_eur(total_kred):,.2f} €")
 
 # =================== Likutis pagal sutartį (automatinis pririšimas per išrašytą sąskaitą) ===================
 st.divider()
 st.subheader("🔗 Kreditinių pririšimas prie sutarčių (per išrašytos sąskaitos numerį)")
 
-# 1) Paruošti indeksą iš IŠRAŠYTŲ SF (paskutinė pagal datą versija) – 2 raktai: exact/digits
-inv_idx = inv[["Data", "Saskaitos_NR", "Klientas", "SutartiesID"]].dropna(subset=["Saskaitos_NR"]).copy()
-inv_idx = inv_idx.sort_values(["Data", "Saskaitos_NR"])
-inv_idx["Key_exact"] = inv_idx["Saskaitos_NR"].apply(norm_key_exact)
-inv_idx["Key_digits"] = inv_idx["Saskaitos_NR"].apply(norm_key_digits)
-exact_map  = inv_idx[inv_idx["Key_exact"]  != ""].drop_duplicates(subset=["Key_exact"],  keep="last")
-digits_map = inv_idx[inv_idx["Key_digits"] != ""].drop_duplicates(subset=["Key_digits"], keep="last")
-
-if crn_f is None or crn_f.empty:
-    out = pd.merge(plans, inv_sum, how="left", on=["Klientas", "SutartiesID"]).fillna({"Israsyta": 0.0})
-    out = _norm_key_cols(out, ("Klientas","SutartiesID"))
-    out["Israsyta"] = out["Israsyta"].apply(floor2)
-    out["Kredituota"] = 0.0
-    out["Faktas"] = out["Israsyta"]
-    out["Like"] = (out["SutartiesPlanas"] - out["Faktas"]).apply(floor2)
+# Vienintelis nuo planų priklausantis žingsnis – jis ir KPI perskaičiuojami kiekvieną kartą
+out = plans.merge(inv_sum, how="left", on=CODE).fillna({"Israsyta": 0})
+if crn_sum is not None:
+    out = out.merge(crn_sum, how="left", on=CODE)
+    out["Kredituota"] = pd.to_numeric(out["Kredituota"], errors="coerce").fillna(0).astype("int64")
 else:
-    # 2) Iš kreditinių Pastabų paimti BENT vieną VS/AAA numerį ir pririšti
-    work = crn_f.copy()
-    work["Ref_raw"]    = work.get("Pastabos", pd.Series(index=work.index, dtype=str)).apply(extract_first_invoice_from_notes)
-    work["Ref_exact"]  = work["Ref_raw"].apply(norm_key_exact)
-    work["Ref_digits"] = work["Ref_raw"].apply(norm_key_digits)
-
-    # 3) Jungimas per exact
-    map_df = work.merge(
-        exact_map[["Key_exact", "Klientas", "SutartiesID"]],
-        left_on="Ref_exact", right_on="Key_exact", how="left", suffixes=("", "_inv")
-    )
-
-    # 4) Kur exact nepavyko – jungiam per digits
-    need = map_df["SutartiesID"].isna() | (map_df["SutartiesID"].astype(str).str.strip() == "")
-    if need.any():
-        fb = map_df.loc[need, ["Ref_digits"]].merge(
-            digits_map[["Key_digits", "Klientas", "SutartiesID"]],
-            left_on="Ref_digits", right_on="Key_digits", how="left"
-        )
-        map_df.loc[need, "Klientas"]    = fb["Klientas"].values
-        map_df.loc[need, "SutartiesID"] = fb["SutartiesID"].values
-
-    # 5) Sumavimas pagal pririštas sutartis
-    map_df["Kredituota_pos"] = map_df["Suma_su_PVM"].abs().fillna(0.0)
-    work_ok = map_df[map_df["SutartiesID"].astype(str).str.strip() != ""].copy()
-
-    if not work_ok.empty:
-        crn_sum = (
-            work_ok.groupby(["Klientas", "SutartiesID"], dropna=False)["Kredituota_pos"]
-            .sum()
-            .reset_index()
-            .rename(columns={"Kredituota_pos": "Kredituota"})
-        )
-    else:
-        crn_sum = pd.DataFrame(columns=["Klientas", "SutartiesID", "Kredituota"])
-
-    crn_sum = _norm_key_cols(crn_sum, ("Klientas","SutartiesID"))
-    crn_sum = crn_sum.groupby(["Klientas","SutartiesID"], as_index=False, dropna=False)["Kredituota"].sum()
-
-    out = pd.merge(plans, inv_sum, how="left", on=["Klientas", "SutartiesID"]).fillna({"Israsyta": 0.0})
-    out = _norm_key_cols(out, ("Klientas","SutartiesID"))
-    out = out.merge(crn_sum, how="left", on=["Klientas","SutartiesID"])
-    out["Kredituota"] = pd.to_numeric(out["Kredituota"], errors="coerce").fillna(0.0)
+    out["Kredituota"] = 0
 
-    out["Israsyta"]  = out["Israsyta"].apply(floor2)
-    out["Kredituota"] = out["Kredituota"].apply(floor2)
-    out["Faktas"]    = (out["Israsyta"] - out["Kredituota"]).apply(floor2)
-    out["Like"]      = (out["SutartiesPlanas"] - out["Faktas"]).apply(floor2)
+# Centai -> sumos tikslios, nukirpimo po kiekvieno veiksmo nebereikia
+out["Israsyta"] = out["Israsyta"].astype("int64")
+out["Faktas"]   = out["Israsyta"] - out["Kredituota"]
+out["Like"]     = out["SutartiesPlanas"] - out["Faktas"]
 
-    st.metric("Pririštų kreditinių skaičius", f"{len(work_ok):,}")
+if crn_sum is not None:
+    st.metric("Pririštų kreditinių skaičius", f"{n_linked:,}")
 
 # =================== KPI ir Likučių lentelė ===================
 st.divider()
 st.subheader("📊 Sutarčių likučiai (SU PVM)")
 
-out = out.fillna(0.0)
-total_planas = floor2(out["SutartiesPlanas"].sum())
-total_israsyta = floor2(out["Israsyta"].sum())
-total_kred = floor2(out.get("Kredituota", pd.Series(0.0, index=out.index)).sum())
-total_faktas = floor2(out["Faktas"].sum())
-total_like = floor2(total_planas - total_faktas)
+out = out.fillna(0)
+total_planas = int(out["SutartiesPlanas"].sum())
+total_israsyta = int(out["Israsyta"].sum())
+total_kred = int(out.get("Kredituota", pd.Series(0, index=out.index)).sum())
+total_faktas = int(out["Faktas"].sum())
+total_like = total_planas - total_faktas
 
 c1, c2, c3, c4 = st.columns(4)
-c1.metric("Išrašyta € (SU PVM)", f"{total_israsyta:,.2f}")
-c2.metric("Kredituota € (SU PVM)", f"{total_kred:,.2f}")
-c3.metric("Faktas € (SU PVM)", f"{total_faktas:,.2f}")
-c4.metric("Likutis € (SU PVM)", f"{total_like:,.2f}")
+c1.metric("Išrašyta € (SU PVM)", f"{cents_to_eur(total_israsyta):,.2f}")
+c2.metric("Kredituota € (SU PVM)", f"{cents_to_eur(total_kred):,.2f}")
+c3.metric("Faktas € (SU PVM)", f"{cents_to_eur(total_faktas):,.2f}")
+c4.metric("Likutis € (SU PVM)", f"{cents_to_eur(total_like):,.2f}")
 
 def progress_bar(p: float) -> str:
     p = 0.0 if pd.isna(p) else float(p)
@@ -479,7 +578,59 @@ cols_order = [
     "PctIsnaudota", "Progresas"
 ]
 show_cols = [c for c in cols_order if c in out.columns]
-st.dataframe(out[show_cols].sort_values(["Klientas", "SutartiesID"]), use_container_width=True)
+
+# Planų „versija“ eksportų ir lentelių podėlio raktui – pasikeitus bet kuriam planui, suvestinė kita
+plans_hash = int(pd.util.hash_pandas_object(plans[["Klientas", "SutartiesID", "SutartiesPlanas"]], index=False).sum())
+
+out_page = paged(
+    out[show_cols], "likuciai",
+    search_cols=("Klientas", "SutartiesID"),
+    default_sort=("Klientas", "SutartiesID"),
+    cache_key=(inv_ver, crn_ver, nuo, iki, plans_hash),
+)
+st.dataframe(eur_frame(out_page, MONEY_COLS), use_container_width=True)
+
+# =================== Eksportai (tik paprašius, fone, su podėliu) ===================
+def build_export(job: jobs.Job, build, fmt: str):
+    """
+    Foninė užduotis: eksporto baitai. Registre raktas – (versijos, laikotarpis, planų hash, ...) + formatas.
+    None – lentelės netelpa į Excel lapą (tikrinama čia, ne skripto gijoje: build() gali būti sunkus).
+    """
+    job.report(0.1, "lentelės")
+    sheets = build()
+    if fmt == "xlsx" and not fits_xlsx(sheets):
+        return None
+    job.report(0.5, "failas")
+    return export_bytes(sheets, fmt)
+
+def lazy_download(name: str, label: str, cache_key: tuple, build, file_stem: str):
+    """
+    Mygtukas „Paruošti“ -> eksportas generuojamas fone (ar paimamas iš registro – ir kitos sesijos
+    paruošto) -> atsisiuntimo mygtukas. Kol niekas neprašo, lentelės neserializuojamos.
+    """
+    state_key = f"export_{name}"
+    c1, c2, c3 = st.columns([2, 1, 2])
+    fmt_label = c1.radio("Formatas", list(EXPORT_FORMATS), horizontal=True, key=f"{state_key}_fmt")
+    fmt = EXPORT_FORMATS[fmt_label]
+    if c2.button("Paruošti", key=f"{state_key}_btn"):
+        st.session_state[state_key] = (cache_key, fmt)
+    if st.session_state.get(state_key) != (cache_key, fmt):
+        return
+    job = jobs.runner().submit(("export", cache_key, fmt), partial(build_export, build=build, fmt=fmt),
+                               label="Ruošiamas eksportas")
+    if not job.wait(JOB_WAIT_S):
+        with c3:
+            jobs.show_progress(job)
+        return
+    if job.error is not None:
+        c3.error(f"Eksportas nepavyko: {job.error}")
+        return
+    if job.result is None:
+        c3.warning("Lentelė viršija Excel eilučių ribą – rinkis CSV arba Parquet.")
+        return
+    data, ext, mime = job.result
+    c3.download_button(f"{label} (.{ext})", data=data, file_name=f"{file_stem}.{ext}", mime=mime, key=f"{state_key}_dl")
+
 
 # =================== Konkrečios sutarties išklotinė + eksportai ===================
 st.divider()
@@ -502,48 +653,53 @@ sel_contract = st.selectbox("Pasirink Sutartį", options=sutartys, index=0 if su
 if sel_client and sel_contract:
     one = sel_df[(sel_df["Klientas"] == sel_client) & (sel_df["SutartiesID"] == sel_contract)].copy()
     if not one.empty:
-        planas = floor2(one["SutartiesPlanas"].sum())
-        israsyta = floor2(one["Israsyta"].sum())
-        kred = floor2(one.get("Kredituota", pd.Series([0.0])).sum())
-        faktas = floor2(one["Faktas"].sum())
-        likutis = floor2(planas - faktas)
+        planas = int(one["SutartiesPlanas"].sum())
+        israsyta = int(one["Israsyta"].sum())
+        kred = int(one.get("Kredituota", pd.Series([0])).sum())
+        faktas = int(one["Faktas"].sum())
+        likutis = planas - faktas
 
         c1, c2, c3 = st.columns(3)
-        c1.metric("Išrašyta €", f"{israsyta:,.2f}")
-        c2.metric("Kredituota €", f"{kred:,.2f}")
-        c3.metric("Faktas €", f"{faktas:,.2f}")
+        c1.metric("Išrašyta €", f"{cents_to_eur(israsyta):,.2f}")
+        c2.metric("Kredituota €", f"{cents_to_eur(kred):,.2f}")
+        c3.metric("Faktas €", f"{cents_to_eur(faktas):,.2f}")
 
         c4, c5, c6 = st.columns(3)
-        c4.metric("Planas €", f"{planas:,.2f}")
-        c5.metric("Likutis €", f"{likutis:,.2f}")
+        c4.metric("Planas €", f"{cents_to_eur(planas):,.2f}")
+        c5.metric("Likutis €", f"{cents_to_eur(likutis):,.2f}")
         c6.metric("% išnaudota", f"{0.0 if planas == 0 else floor2((faktas / planas) * 100):,.2f}%")
 
-        st.dataframe(one[show_cols], use_container_width=True)
+        st.dataframe(eur_frame(one[show_cols], MONEY_COLS), use_container_width=True)
 
-        buf_one = BytesIO()
-        with pd.ExcelWriter(buf_one, engine="openpyxl") as xw:
-            one[show_cols].to_excel(xw, sheet_name=safe_sheet_name(sel_contract, "Sutartis"), index=False)
-        st.download_button(
-            "⬇️ Atsisiųsti šios sutarties išklotinę (.xlsx)",
-            data=buf_one.getvalue(),
-            file_name=f"{safe_filename(sel_client)}__{safe_filename(sel_contract)}__{nuo}_{iki}__likutis_SU_PVM.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        lazy_download(
+            "sutartis",
+            "⬇️ Atsisiųsti šios sutarties išklotinę",
+            (inv_ver, crn_ver, nuo, iki, plans_hash, sel_client, sel_contract),
+            lambda: {safe_sheet_name(sel_contract, "Sutartis"): eur_frame(one[show_cols], MONEY_COLS)},
+            f"{safe_filename(sel_client)}__{safe_filename(sel_contract)}__{nuo}_{iki}__likutis_SU_PVM",
         )
 else:
     st.info("Pasirink **Klientą** ir **Sutartį**.")
 
-# Bendras eksportas – visa suvestinė
-buf_all = BytesIO()
-with pd.ExcelWriter(buf_all, engine="openpyxl") as xw:
-    out[show_cols].to_excel(xw, sheet_name="Sutarciu_likuciai_SU_PVM", index=False)
-    inv_f.to_excel(xw, sheet_name="Saskaitos_ISRASYTA_SU_PVM", index=False)
+# Bendras eksportas – visa suvestinė (generuojama tik paprašius)
+def _summary_sheets() -> dict:
+    # Tik įkėlimo stulpeliai – be vidinio Kodas ir kilmės (Saltinis/Lapas) stulpelių
+    inv_p = period_inv(inv_ver, nuo, iki)
+    cols_inv = [c for c in ["Data","Saskaitos_NR","Klientas","SutartiesID","Suma","Suma_su_PVM"] if c in inv_p.columns]
+    sheets = {
+        "Sutarciu_likuciai_SU_PVM": eur_frame(out[show_cols], MONEY_COLS),
+        "Saskaitos_ISRASYTA_SU_PVM": eur_frame(inv_p[cols_inv], MONEY_COLS),
+    }
     if crn_f is not None and not crn_f.empty:
         cols_crn = [c for c in ["Data","Saskaitos_NR","Klientas","Pastabos","Suma_su_PVM","Tipas"] if c in crn_f.columns]
-        crn_f[cols_crn].to_excel(xw, sheet_name="Kreditines_SU_PVM", index=False)
+        sheets["Kreditines_SU_PVM"] = eur_frame(crn_f[cols_crn], MONEY_COLS)
+    return sheets
 
-st.download_button(
-    "⬇️ Eksportuoti suvestinę (.xlsx)",
-    data=buf_all.getvalue(),
-    file_name=f"sutarciu_likuciai_SU_PVM__{nuo}_{iki}.xlsx",
-    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+st.divider()
+lazy_download(
+    "suvestine",
+    "⬇️ Eksportuoti suvestinę",
+    (inv_ver, crn_ver, nuo, iki, plans_hash),
+    _summary_sheets,
+    f"sutarciu_likuciai_SU_PVM__{nuo}_{iki}",
 )
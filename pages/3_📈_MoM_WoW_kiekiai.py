@@ -8,11 +8,17 @@ import unicodedata
 import plotly.graph_objects as go
 import plotly.io as pio
 
+from core import auth, store
+from core.downsample import coarsen_bars, downsample_line
+
 # ------------------------------------------------------------
 # Puslapio nustatymai ir tema
 # ------------------------------------------------------------
 st.set_page_config(layout="wide")
 
+# Duomenys bendri visam serveriui – be prisijungimo puslapis nerodomas (atidarius ir tiesiogiai pagal URL)
+auth.require_login()
+
 st.markdown("""
 <style>
   .block-container {padding-top: 0.5rem; padding-bottom: 0.75rem; max-width: 1500px;}
@@ -47,9 +53,6 @@ st.header("📈 Dokumentų kiekio dinamika (MoM & WoW)")
 # ------------------------------------------------------------
 # Pagalbinės
 # ------------------------------------------------------------
-def ensure_df(src):
-    return src if isinstance(src, pd.DataFrame) else None
-
 def _norm_colname(c: str) -> str:
     if c is None: return ""
     s = str(c).strip().lower()
@@ -98,14 +101,22 @@ def coerce_date_col(df: pd.DataFrame, col: str):
     d[col] = pd.to_datetime(d[col], errors="coerce", dayfirst=True)  # LT formatas
     return d
 
-def to_period_series(s: pd.Series, granularity: str) -> pd.Series:
-    return s.dt.to_period("M").astype(str) if granularity == "M" else s.dt.to_period("W-MON").astype(str)
-
-def period_start_ts(p: str, granularity: str) -> pd.Timestamp:
-    try:
-        return pd.Period(p, freq=("M" if granularity == "M" else "W-MON")).start_time
-    except Exception:
-        return pd.NaT
+def period_codes(s: pd.Series, granularity: str) -> np.ndarray:
+    """
+    datetime64 -> sveikas periodo kodas (be Period/str): mėnesiai nuo 1970-01 arba
+    ISO savaitės (nuo pirmadienio) nuo epochos; 1970-01-01 buvo ketvirtadienis, todėl +3.
+    """
+    v = s.to_numpy(dtype="datetime64[ns]")
+    if granularity == "M":
+        return v.astype("datetime64[M]").astype(np.int64)
+    return (v.astype("datetime64[D]").astype(np.int64) + 3) // 7
+
+def period_start(codes, granularity: str) -> pd.DatetimeIndex:
+    """Periodo kodas -> periodo pradžia (mėnesio 1 d. arba savaitės pirmadienis)."""
+    codes = np.asarray(codes, dtype=np.int64)
+    if granularity == "M":
+        return pd.DatetimeIndex(codes.astype("datetime64[M]").astype("datetime64[ns]"))
+    return pd.DatetimeIndex((codes * 7 - 3).astype("datetime64[D]").astype("datetime64[ns]"))
 
 def moving_average(series: pd.Series, window: int) -> pd.Series:
     return series.rolling(window=window, min_periods=1).mean()
@@ -128,39 +139,43 @@ def min_max_date(*dfs):
         return today, today
     return s.min().normalize(), s.max().normalize()
 
-def build_doc_level(df_raw: pd.DataFrame, id_col: str, date_col: str) -> pd.DataFrame:
+def pick_client_column(df: pd.DataFrame) -> str | None:
+    """Kliento stulpelis (nebūtinas – be jo nerodom tik pjūvio pagal klientą)."""
+    return find_column(df, ["Klientas", "Pirkėjas", "Pirkejas", "Customer", "Client"])
+
+def build_doc_level(df_raw: pd.DataFrame, id_col: str, date_col: str, client_col: str | None = None) -> pd.DataFrame:
     """
     Iš VISŲ eilučių (nepo filtro) sukonstruoja dokumentų lygį:
-      1 eil. = 1 dokumentas; Data = min(data) per dokumentą (antraštės data).
+      1 eil. = 1 dokumentas; Data = min(data) per dokumentą (antraštės data),
+      Klientas – tos pačios (ankstyviausios) eilutės klientas, jei client_col nurodytas.
     """
     if df_raw is None or df_raw.empty or id_col is None or date_col is None:
         return pd.DataFrame(columns=["Data", id_col])
-    d = df_raw[[id_col, date_col]].copy()
-    d[date_col] = pd.to_datetime(d[date_col], errors="coerce", dayfirst=True)
+    cols = [id_col, date_col] + ([client_col] if client_col else [])
+    d = df_raw[cols]
+    if not pd.api.types.is_datetime64_any_dtype(d[date_col]):  # coerce_date_col jau paprastai išparsino
+        d = d.assign(**{date_col: pd.to_datetime(d[date_col], errors="coerce", dayfirst=True)})
     d = d.dropna(subset=[id_col, date_col])
+    # Ankstyviausia dokumento eilutė = groupby(id).min(data), tik kartu su jos klientu
     out = (
-        d.groupby(id_col, as_index=False)[date_col]
-         .min()
-         .rename(columns={date_col: "Data"})
+        d.sort_values(date_col, kind="mergesort")
+         .drop_duplicates(subset=[id_col], keep="first")
+         .rename(columns={date_col: "Data", **({client_col: "Klientas"} if client_col else {})})
     )
-    return out
+    return out.reset_index(drop=True)
 
-def counts_unique_docs(doc_df: pd.DataFrame, id_col: str, granularity: str) -> pd.DataFrame:
-    """Dokumentų lygis -> kiekis per periodą (unikalūs)."""
+def counts_unique_docs(doc_df: pd.DataFrame, granularity: str) -> pd.Series:
+    """
+    Dokumentų lygis (1 eil. = 1 dokumentas) -> kiekis per periodą, np.bincount per periodų kodus.
+    Indeksas – periodo kodas (tik periodai su dokumentais).
+    """
     if doc_df is None or doc_df.empty:
-        return pd.DataFrame(columns=["Periodas", "Kiekis"])
-    d = doc_df.copy()
-    d["Data"] = pd.to_datetime(d["Data"], errors="coerce", dayfirst=True)
-    d = d.dropna(subset=["Data", id_col])
-    d["Periodas"] = to_period_series(d["Data"], "M" if granularity == "M" else "W")
-    d = d.drop_duplicates(subset=["Periodas", id_col])  # vienas doc per periodą 1 kartą
-    return (
-        d.groupby("Periodas")[id_col]
-         .size()
-         .reset_index(name="Kiekis")
-         .sort_values("Periodas")
-         .reset_index(drop=True)
-    )
+        return pd.Series(dtype="int64", name="Kiekis")
+    codes = period_codes(doc_df["Data"], granularity)
+    c0 = codes.min()
+    cnt = np.bincount(codes - c0)
+    nz = np.flatnonzero(cnt)
+    return pd.Series(cnt[nz], index=nz + c0, name="Kiekis")
 
 # --- Kritinis: kreditinių prefiksų filtras (dokumentų numeriui) ---
 CREDIT_PREFIX_RE = r'^\s*(?:COP|KRE|AAA)(?:[\s\-]?)'  # leidžiam tarpą/brūkšnį po prefikso
@@ -173,31 +188,173 @@ def filter_credit_by_prefix(df: pd.DataFrame, id_col: str) -> pd.DataFrame:
     return df.loc[mask].copy()
 
 # ------------------------------------------------------------
-# Duomenys iš sesijos
+# Skaičiavimo etapai (podėlis): raktas – rinkinio versija ir periodiškumas.
+# Jungikliai ir laikotarpis tik „perpjauna“ jau paruoštas lenteles.
+# ------------------------------------------------------------
+@st.cache_resource(max_entries=4, show_spinner="Ruošiamas dokumentų lygis…")
+def doc_level(kind: str, ver: str, credit_only: bool = False):
+    """
+    (dokumentų lentelė rikiuota pagal Data, ID stulpelis, DATA stulpelis) visam rinkiniui.
+    Lentelė None, jei ID/DATA stulpelių nėra arba (kreditinėms) po prefikso filtro nieko nelieka.
+    """
+    raw = store.load(kind, ver)
+    id_col, date_col = pick_id_column_strict(raw), pick_date_column(raw)
+    if id_col is None or date_col is None:
+        return None, id_col, date_col
+    client_col = pick_client_column(raw)
+    if client_col in (id_col, date_col):
+        client_col = None
+    # Datų parse (dayfirst) – nekeičiam ID
+    raw = coerce_date_col(raw[[id_col, date_col] + ([client_col] if client_col else [])], date_col)
+    if credit_only:
+        # *** Kritiška: CRN filtras pagal prefiksą COP|KRE|AAA ***
+        raw = filter_credit_by_prefix(raw, id_col)
+        if raw.empty:
+            return None, id_col, date_col
+    docs = build_doc_level(raw, id_col, date_col, client_col)
+    if "Klientas" in docs.columns:
+        # Klientai – kategorija: pjūviai per klientus tada tik np.bincount per kodus
+        docs["Klientas"] = docs["Klientas"].astype(str).str.strip().astype("category")
+    return docs, id_col, date_col
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def period_runs(kind: str, ver: str, credit_only: bool, granularity: str):
+    """
+    Dokumentai surikiuoti pagal datą, todėl periodų kodai nemažėja: kiekvienas periodas –
+    ištisinė atkarpa [pradžia; pabaiga). Grąžina (kodai, pradžios, pabaigos, datos ns).
+    """
+    docs = doc_level(kind, ver, credit_only)[0]
+    if docs is None or docs.empty:
+        z = np.zeros(0, dtype=np.int64)
+        return z, z, z, z
+    codes = period_codes(docs["Data"], granularity)
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    ends = np.r_[starts[1:], len(codes)]
+    return codes[starts], starts, ends, docs["Data"].to_numpy(dtype="datetime64[ns]")
+
+def _range_pos(dates: np.ndarray, nuo: date, iki: date) -> tuple[int, int]:
+    """Pagal datą rikiuotų dokumentų atkarpa [a; b), patenkanti į [nuo; iki]."""
+    a = np.searchsorted(dates, np.datetime64(pd.Timestamp(nuo)), side="left")
+    b = np.searchsorted(dates, np.datetime64(pd.Timestamp(iki) + pd.Timedelta(days=1)), side="left")
+    return int(a), int(b)
+
+def counts_between(kind: str, ver: str | None, credit_only: bool, granularity: str, nuo: date, iki: date) -> pd.Series:
+    """Unikalių dokumentų kiekis per periodą laikotarpyje [nuo; iki] – tik atkarpų apkarpymas."""
+    if ver is None:
+        return pd.Series(dtype="int64", name="Kiekis")
+    codes, starts, ends, dates = period_runs(kind, ver, credit_only, granularity)
+    a, b = _range_pos(dates, nuo, iki)
+    cnt = np.minimum(ends, b) - np.maximum(starts, a)
+    hit = cnt > 0
+    return pd.Series(cnt[hit], index=codes[hit], name="Kiekis")
+
+def client_counts(kind: str, ver: str | None, credit_only: bool, granularity: str, nuo: date, iki: date, last_code: int) -> pd.DataFrame:
+    """
+    Kiekis per klientą laikotarpyje: Viso, Paskutinis (periodas last_code) ir Ankstesnis (last_code - 1).
+    Tik atkarpų bincount per kliento kodus – eilučių negrupuojam.
+    """
+    cols = ["Viso", "Paskutinis", "Ankstesnis"]
+    docs = doc_level(kind, ver, credit_only)[0] if ver is not None else None
+    if docs is None or docs.empty or "Klientas" not in docs.columns:
+        return pd.DataFrame(columns=cols, dtype="int64")
+    codes, starts, ends, dates = period_runs(kind, ver, credit_only, granularity)
+    a, b = _range_pos(dates, nuo, iki)
+    cl = docs["Klientas"].cat.codes.to_numpy()
+    n = len(docs["Klientas"].cat.categories)
+
+    def _cnt(lo: int, hi: int) -> np.ndarray:
+        c = cl[lo:hi]
+        return np.bincount(c[c >= 0], minlength=n) if hi > lo else np.zeros(n, dtype=np.int64)
+
+    def _period(code: int) -> np.ndarray:
+        i = np.searchsorted(codes, code)
+        if i < len(codes) and codes[i] == code:
+            return _cnt(max(starts[i], a), min(ends[i], b))
+        return np.zeros(n, dtype=np.int64)
+
+    out = pd.DataFrame({"Viso": _cnt(a, b), "Paskutinis": _period(last_code), "Ankstesnis": _period(last_code - 1)},
+                       index=docs["Klientas"].cat.categories)
+    return out[out.any(axis=1)]
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def growth_analytics(inv_ver: str, crn_ver: str | None, granularity: str, nuo: date, iki: date, crn_negative: bool):
+    """
+    Pokyčių analitika vieną kartą laikotarpiui (nuo jungiklio „slankus vidurkis“ nepriklauso):
+      periods – ištisinė periodų eilė su Kiekis, Pokytis %, YoY % (vektoriniai shift);
+      clients – kiekis per klientą su paskutinio periodo pokyčiu (top judėjimams).
+    """
+    sign = -1 if crn_negative else 1
+    inv_cnt = counts_between("inv_norm", inv_ver, False, granularity, nuo, iki)
+    crn_cnt = counts_between("crn_norm", crn_ver, True, granularity, nuo, iki)
+    tot = inv_cnt.add(sign * crn_cnt, fill_value=0)
+    if tot.empty:
+        return None, None
+    # Tarpai (periodai be dokumentų) = 0, kad shift reikštų „ankstesnis periodas“
+    codes = np.arange(int(tot.index.min()), int(tot.index.max()) + 1)
+    k = tot.reindex(codes, fill_value=0).astype("int64")
+    yoy_lag = 12 if granularity == "M" else 52
+    prev, yoy = k.shift(1), k.shift(yoy_lag)
+    periods = pd.DataFrame({
+        "Pradzia": period_start(codes, granularity),
+        "Kiekis": k.to_numpy(),
+        "Pokytis": (k - prev).to_numpy(),
+        "Pokytis %": ((k - prev) / prev.where(prev != 0) * 100).to_numpy(),
+        "Prieš metus": yoy.to_numpy(),
+        "YoY %": ((k - yoy) / yoy.where(yoy != 0) * 100).to_numpy(),
+    })
+
+    last = int(codes[-1])
+    ci = client_counts("inv_norm", inv_ver, False, granularity, nuo, iki, last)
+    cc = client_counts("crn_norm", crn_ver, True, granularity, nuo, iki, last)
+    clients = ci.add(sign * cc, fill_value=0).astype("int64")
+    clients["Pokytis"] = clients["Paskutinis"] - clients["Ankstesnis"]
+    clients["Pokytis %"] = clients["Pokytis"] / clients["Ankstesnis"].where(clients["Ankstesnis"] != 0) * 100
+    clients = clients.rename_axis("Klientas").sort_values("Viso", ascending=False)
+    return periods, clients
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def date_bounds(inv_ver: str, crn_ver: str | None):
+    """Laikotarpis – iš visų eilučių datų (su dayfirst)."""
+    frames = []
+    for kind, ver in (("inv_norm", inv_ver), ("crn_norm", crn_ver)):
+        if ver is None:
+            continue
+        raw = store.load(kind, ver)
+        col = pick_date_column(raw)
+        if col is not None:
+            frames.append(pd.DataFrame({"Data": raw[col]}))
+    return min_max_date(*frames)
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def crn_prefix_top(crn_ver: str) -> pd.Series:
+    """Diagnostikai: kreditinių prefiksų TOP po filtro COP|KRE|AAA."""
+    raw = store.load("crn_norm", crn_ver)
+    id_col = pick_id_column_strict(raw)
+    if id_col is None:
+        return pd.Series(dtype="int64")
+    raw = filter_credit_by_prefix(raw[[id_col]], id_col)
+    return raw[id_col].astype(str).str.upper().str.strip().str.extract(r'^([A-Z]+)')[0].value_counts().head(10)
+
+# ------------------------------------------------------------
+# Duomenys iš bendros saugyklos
 # ------------------------------------------------------------
-inv_raw = ensure_df(st.session_state.get("inv_norm"))
-crn_raw = ensure_df(st.session_state.get("crn_norm"))
+inv_ver = store.current_version("inv_norm")
+crn_ver = store.current_version("crn_norm")
 
-if inv_raw is None:
+if inv_ver is None:
     st.warning("Įkelk duomenis skiltyje **📥 Įkėlimas**.")
     st.stop()
 
 # ID ir DATA stulpeliai (griežtai)
-inv_id = pick_id_column_strict(inv_raw)
-inv_date_col = pick_date_column(inv_raw)
+inv_docs_all, inv_id, inv_date_col = doc_level("inv_norm", inv_ver)
 if inv_id is None or inv_date_col is None:
     with st.expander("Diagnostika: INV ID/DATA"):
-        st.write("inv_raw stulpeliai:", list(inv_raw.columns))
+        st.write("inv_raw stulpeliai:", list(store.load("inv_norm", inv_ver).columns))
     st.error("INV privalo turėti dokumento numerį ir datą (antraštės lygio).")
     st.stop()
 
-crn_id = pick_id_column_strict(crn_raw) if crn_raw is not None else None
-crn_date_col = pick_date_column(crn_raw) if crn_raw is not None else None
-
-# Datų parse (dayfirst) – nekeičiam ID
-inv_raw = coerce_date_col(inv_raw, inv_date_col)
-if crn_raw is not None and crn_date_col:
-    crn_raw = coerce_date_col(crn_raw, crn_date_col)
+crn_docs_all, crn_id, crn_date_col = doc_level("crn_norm", crn_ver, True) if crn_ver is not None else (None, None, None)
+crn_ok = crn_docs_all is not None
 
 # ------------------------------------------------------------
 # UI: periodiškumas / slankus / laikotarpis
@@ -213,10 +370,7 @@ with c2:
     crn_negative = st.toggle("Kreditines skaičiuoti su minusu", value=False)
 
 # Laikotarpis – iš visų datų, su dayfirst
-dmin, dmax = min_max_date(
-    inv_raw.rename(columns={inv_date_col: "Data"}),
-    None if crn_raw is None or crn_date_col is None else crn_raw.rename(columns={crn_date_col: "Data"})
-)
+dmin, dmax = date_bounds(inv_ver, crn_ver)
 rng = st.date_input(
     "Laikotarpis (nuo – iki)",
     value=(dmin.date(), dmax.date()),
@@ -232,44 +386,29 @@ else:
     nuo, iki = dmin.date(), dmax.date()
 
 # ------------------------------------------------------------
-# *** Kritiška: CRN filtras pagal prefiksą COP|KRE|AAA ***
-# ------------------------------------------------------------
-if crn_raw is not None and crn_id:
-    crn_raw = filter_credit_by_prefix(crn_raw, crn_id)
-    # Jei po filtro tuščia – nėra kreditinių
-    if crn_raw.empty:
-        crn_raw = None
-
-# ------------------------------------------------------------
-# Dokumentų LYGIO lentelės (iš VISŲ duomenų), tada filtras pagal datą
+# Kiekiai per periodus (unikalūs dokumentai) – filtras taikomas DOC lygiui (NE eilutėms)
 # ------------------------------------------------------------
-inv_docs_all = build_doc_level(inv_raw, inv_id, inv_date_col)
-crn_docs_all = build_doc_level(crn_raw, crn_id, crn_date_col) if (crn_raw is not None and crn_id and crn_date_col) else None
-
-# Filtras taikomas DOC lygiui (NE eilutėms) – nebesumigravęs į „sausį“
-inv_docs = inv_docs_all.loc[inv_docs_all["Data"].dt.date.between(nuo, iki)].copy()
-crn_docs = crn_docs_all.loc[crn_docs_all["Data"].dt.date.between(nuo, iki)].copy() if crn_docs_all is not None else None
+inv_cnt = counts_between("inv_norm", inv_ver, False, gran, nuo, iki)
+crn_cnt = counts_between("crn_norm", crn_ver if crn_ok else None, True, gran, nuo, iki)
+crn_ver_ok = crn_ver if crn_ok else None
 
-if inv_docs.empty and (crn_docs is None or crn_docs.empty):
+if inv_cnt.empty and crn_cnt.empty:
     st.info("Pasirinktame laikotarpyje dokumentų nerasta.")
     st.stop()
 
-# ------------------------------------------------------------
-# Kiekiai per periodus (unikalūs dokumentai)
-# ------------------------------------------------------------
-inv_cnt = counts_unique_docs(inv_docs.rename(columns={inv_id: "DOC_ID"}), "DOC_ID", gran)
-crn_cnt = counts_unique_docs(crn_docs.rename(columns={crn_id: "DOC_ID"}), "DOC_ID", gran) if (crn_docs is not None and not crn_docs.empty) else pd.DataFrame(columns=["Periodas","Kiekis"])
-
 all_cnt = (
-    pd.merge(inv_cnt, crn_cnt, how="outer", on="Periodas", suffixes=("_inv", "_crn"))
+    pd.concat({"Kiekis_inv": inv_cnt, "Kiekis_crn": crn_cnt}, axis=1)
       .fillna(0)
+      .astype("int64")
+      .sort_index()
 )
 all_cnt["Kiekis"] = (all_cnt["Kiekis_inv"] - all_cnt["Kiekis_crn"]) if crn_negative else (all_cnt["Kiekis_inv"] + all_cnt["Kiekis_crn"])
-all_cnt = all_cnt[["Periodas","Kiekis"]].sort_values("Periodas").reset_index(drop=True)
-
-if all_cnt.empty:
-    st.info("Pasirinktame laikotarpyje dokumentų nerasta.")
-    st.stop()
+# Stulpeliams – ištisinė periodų eilė (tušti periodai = 0, kaip growth_analytics): sujungiant
+# k periodų grupė tada apima k gretimų kalendorinių periodų, o vidurkis skaičiuoja ir tuščius
+codes = np.arange(int(all_cnt.index.min()), int(all_cnt.index.max()) + 1)
+bar_cnt = pd.DataFrame({"Pradzia": period_start(codes, gran), "Kiekis": all_cnt["Kiekis"].reindex(codes, fill_value=0).to_numpy()})
+all_cnt.insert(0, "Pradzia", period_start(all_cnt.index, gran))
+all_cnt = all_cnt[["Pradzia", "Kiekis"]].reset_index(drop=True)
 
 # ------------------------------------------------------------
 # Grafikas
@@ -277,17 +416,20 @@ if all_cnt.empty:
 st.subheader("Kiekis per periodus")
 
 plot_df = all_cnt.copy()
-plot_df["Pradzia"] = plot_df["Periodas"].apply(lambda p: period_start_ts(p, gran))
-plot_df = plot_df.dropna(subset=["Pradzia"]).sort_values("Pradzia").reset_index(drop=True)
 
 if show_ma:
     window = 3 if gran == "M" else 4
     plot_df["Slankus vidurkis"] = moving_average(plot_df["Kiekis"], window)
 
+# Į naršyklę – ribotas taškų kiekis: ilgiems laikotarpiams stulpeliai sujungiami, linija – LTTB
+bars, k = coarsen_bars(bar_cnt, "Pradzia", "Kiekis")
+bar_name = f"Kiekis per {'mėn.' if gran=='M' else 'sav.'}" if k == 1 else f"Vid. kiekis per {'mėn.' if gran=='M' else 'sav.'} ({k} {'mėn.' if gran=='M' else 'sav.'} grupės)"
+
 fig = go.Figure()
-fig.add_bar(x=plot_df["Pradzia"], y=plot_df["Kiekis"], name=f"Kiekis per {'mėn.' if gran=='M' else 'sav.'}", marker_color="#00E5FF", opacity=0.45)
+fig.add_bar(x=bars["Pradzia"], y=bars["Kiekis"], name=bar_name, marker_color="#00E5FF", opacity=0.45)
 if show_ma:
-    fig.add_scatter(x=plot_df["Pradzia"], y=plot_df["Slankus vidurkis"], name=f"Slankus vidurkis ({window} {'mėn.' if gran=='M' else 'sav.'})", mode="lines", line=dict(color="#76A9FA", width=3))
+    line = downsample_line(plot_df, "Pradzia", "Slankus vidurkis")
+    fig.add_scatter(x=line["Pradzia"], y=line["Slankus vidurkis"], name=f"Slankus vidurkis ({window} {'mėn.' if gran=='M' else 'sav.'})", mode="lines", line=dict(color="#76A9FA", width=3))
 
 fig.update_layout(title="Išrašytų dokumentų kiekis per periodą", height=420, bargap=0.12, hovermode="x unified")
 fig.update_xaxes(tickformat="%Y %b" if gran == "M" else "%Y-%m-%d", showgrid=True)
@@ -298,8 +440,8 @@ st.plotly_chart(fig, use_container_width=True)
 # ------------------------------------------------------------
 # KPI (unikalūs dokumentai) – čia ir pamatysi 18 vietoje 211
 # ------------------------------------------------------------
-total_inv = int(inv_docs.shape[0]) if inv_docs is not None else 0
-total_crn = int(crn_docs.shape[0]) if (crn_docs is not None) else 0
+total_inv = int(inv_cnt.sum())
+total_crn = int(crn_cnt.sum())
 total_net = int(all_cnt["Kiekis"].sum())
 
 k1, k2, k3 = st.columns(3)
@@ -307,6 +449,63 @@ k1.metric("Sąskaitų kiekis (unikalūs)", f"{total_inv:,}".replace(",", " "))
 k2.metric("Kreditinių kiekis (unikalūs)", f"{total_crn:,}".replace(",", " "))
 k3.metric(("Grynas kiekis (su minusu)" if crn_negative else "Bendras kiekis (inv+crn)"), f"{total_net:,}".replace(",", " "))
 
+# ------------------------------------------------------------
+# Pokyčiai: MoM/WoW, YoY, klientai ir didžiausi judėjimai
+# ------------------------------------------------------------
+periods, clients = growth_analytics(inv_ver, crn_ver_ok, gran, nuo, iki, crn_negative)
+per_lbl = "mėn." if gran == "M" else "sav."
+pp_lbl = "MoM" if gran == "M" else "WoW"
+
+def _fmt_pct(x) -> str | None:
+    return None if pd.isna(x) else f"{x:+.1f}%"
+
+st.subheader(f"Pokyčiai ({pp_lbl} / YoY)")
+last_row = periods.iloc[-1]
+last_lbl = last_row["Pradzia"].strftime("%Y-%m" if gran == "M" else "%Y-%m-%d")
+g1, g2, g3 = st.columns(3)
+g1.metric(f"Paskutinis periodas ({last_lbl})", f"{int(last_row['Kiekis']):,}".replace(",", " "),
+          delta=_fmt_pct(last_row["Pokytis %"]), help=f"Pokytis lyginant su ankstesniu {per_lbl}")
+g2.metric(f"Ankstesnis {per_lbl}", "–" if len(periods) < 2 else f"{int(periods['Kiekis'].iloc[-2]):,}".replace(",", " "))
+g3.metric("Prieš metus", "–" if pd.isna(last_row["Prieš metus"]) else f"{int(last_row['Prieš metus']):,}".replace(",", " "),
+          delta=_fmt_pct(last_row["YoY %"]), help="YoY: tas pats periodas prieš metus")
+
+tab_p, tab_c, tab_m = st.tabs(["Periodų pokyčiai", "Pagal klientą", "Top judėjimai"])
+with tab_p:
+    st.dataframe(
+        periods.iloc[::-1],
+        hide_index=True,
+        use_container_width=True,
+        column_config={
+            "Pradzia": st.column_config.DateColumn("Periodas", format="YYYY-MM" if gran == "M" else "YYYY-MM-DD"),
+            "Pokytis %": st.column_config.NumberColumn(f"{pp_lbl} %", format="%.1f%%"),
+            "YoY %": st.column_config.NumberColumn("YoY %", format="%.1f%%"),
+        },
+    )
+with tab_c:
+    if clients.empty:
+        st.info("Duomenyse nėra kliento stulpelio.")
+    else:
+        st.dataframe(
+            clients,
+            use_container_width=True,
+            column_config={
+                "Viso": "Viso laikotarpyje",
+                "Paskutinis": f"Paskutinis {per_lbl}",
+                "Ankstesnis": f"Ankstesnis {per_lbl}",
+                "Pokytis %": st.column_config.NumberColumn(f"{pp_lbl} %", format="%.1f%%"),
+            },
+        )
+with tab_m:
+    if clients.empty:
+        st.info("Duomenyse nėra kliento stulpelio.")
+    else:
+        TOP_N = 10
+        m1, m2 = st.columns(2)
+        m1.markdown(f"**▲ Didžiausias augimas ({pp_lbl})**")
+        m1.dataframe(clients[clients["Pokytis"] > 0].nlargest(TOP_N, "Pokytis")[["Ankstesnis", "Paskutinis", "Pokytis", "Pokytis %"]], use_container_width=True)
+        m2.markdown(f"**▼ Didžiausias kritimas ({pp_lbl})**")
+        m2.dataframe(clients[clients["Pokytis"] < 0].nsmallest(TOP_N, "Pokytis")[["Ankstesnis", "Paskutinis", "Pokytis", "Pokytis %"]], use_container_width=True)
+
 # ------------------------------------------------------------
 # Diagnostika – kad užmuštume klaidą vietoje
 # ------------------------------------------------------------
@@ -314,11 +513,11 @@ with st.expander("🔎 Diagnostika (paspausk jei reikia)"):
     st.write("Laikotarpis:", f"{nuo} – {iki}")
     st.write("INV ID:", inv_id, "| INV DATA:", inv_date_col, "| INV doc #:", len(inv_docs_all))
     st.write("CRN ID:", crn_id, "| CRN DATA:", crn_date_col, "| CRN doc # (po prefikso filtro):", 0 if crn_docs_all is None else len(crn_docs_all))
-    if crn_raw is not None and crn_id in crn_raw.columns:
+    if crn_ok:
         # parodyti top prefiksus pačiam pasitikrinti
-        pref = crn_raw[crn_id].astype(str).str.upper().str.strip().str.extract(r'^([A-Z]+)')[0].value_counts().head(10)
         st.write("CRN prefiksų TOP (po filtro COP|KRE|AAA):")
-        st.dataframe(pref)
+        st.dataframe(crn_prefix_top(crn_ver))
     if crn_docs_all is not None:
         st.write("CRN mėnesių skirstinys (iš VISŲ duomenų po prefikso filtro):")
-        st.dataframe(crn_docs_all.assign(M=lambda d: d["Data"].dt.to_period("M").astype(str)).M.value_counts().sort_index())
+        m_cnt = counts_unique_docs(crn_docs_all, "M")
+        st.dataframe(m_cnt.set_axis(period_start(m_cnt.index, "M").strftime("%Y-%m")).rename_axis("M"))
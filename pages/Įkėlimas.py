@@ -1,52 +1,187 @@
 import streamlit as st
 import pandas as pd
+import hashlib
+import threading
+from collections import OrderedDict
+
+from core import auth, store, invoice_index
+from core.ingest import SOURCE_COLS, USECOLS, combine_sources, parse_parallel, sheet_names
+from core.money import eur_frame
 
 st.header("📥 Įkėlimas")
 
-def read_by_letters(file_or_buf,
-                    names=("Data","Saskaitos_NR","Klientas","SutartiesID","Suma")) -> pd.DataFrame:
+# Duomenys bendri visam serveriui – be prisijungimo puslapis nerodomas (atidarius ir tiesiogiai pagal URL)
+auth.require_login()
+
+# =================== Bendras (visoms sesijoms) nuskaitymų podėlis ===================
+PARSE_CACHE_MAX_MB = 512  # bendra podėlio riba; seniausiai naudoti įrašai išmetami pirmi
+
+class ParseCache:
+    """LRU podėlis: (failo turinio hash, stulpelių raidės) -> normalizuotas DataFrame, ribojamas atminties kiekiu."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()  # key -> (df, nbytes)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            hit = self._items.get(key)
+            if hit is None:
+                return None
+            self._items.move_to_end(key)
+            return hit[0]
+
+    def put(self, key, df: pd.DataFrame):
+        nbytes = int(df.memory_usage(deep=True).sum())
+        if nbytes > self.max_bytes:
+            return  # per didelis – nelaikom, kad neišstumtų visų kitų
+        with self._lock:
+            if key in self._items:
+                self._bytes -= self._items.pop(key)[1]
+            self._items[key] = (df, nbytes)
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes:
+                _, (_, old) = self._items.popitem(last=False)
+                self._bytes -= old
+
+@st.cache_resource
+def _parse_cache() -> ParseCache:
+    return ParseCache(PARSE_CACHE_MAX_MB * 1024 * 1024)
+
+def prepare_upload(files, kind: str, append: bool, all_sheets: bool) -> dict | None:
     """
-    Skaito Excel BE antraščių ir paima konkrečius stulpelius:
-    A=Data, B=Sąskaitos_NR, D=Klientas, F=SutartiesID, G=Suma.
-    (SVARBU: usecols – VIENAS string, o ne sąrašas -> nebus ValueError)
+    Pirmas etapas (be skaitymo): None – šie failai šioje sesijoje jau įkelti;
+    kitaip {"src", "files": [(vardas, data, hash)], "digest", "parse", "all_sheets"}.
+    digest – viso rinkinio (failų turinio, tvarkos, lapų ir įkėlimo režimo) hash; jis tampa versijos žyme.
+    Režimas įeina, nes papildymo versija = istorija + failai: tie patys failai „Pakeisti“ režimu
+    yra kitas rinkinys. parse=False – dabartinė versija sukurta iš tų pačių failų tuo pačiu režimu.
     """
-    df = pd.read_excel(
-        file_or_buf,
-        header=None,
-        engine="openpyxl",
-        usecols="A,B,D,F,G"
-    )
-    df.columns = list(names)
-
-    # Tipai ir sanitarija
-    df["Data"] = pd.to_datetime(df["Data"], errors="coerce")
-    df["Suma"] = pd.to_numeric(df["Suma"], errors="coerce")
-    for c in ("Klientas","SutartiesID","Saskaitos_NR"):
-        df[c] = df[c].astype(str).str.strip()
-
-    # Pas tave be PVM -> lygu Suma
-    df["Suma_su_PVM"] = df["Suma"].fillna(0.0)
-    return df
+    src = (tuple(f.file_id for f in files), append, all_sheets)
+    if st.session_state.get(f"{kind}_src") == src:
+        return None
+    items = []
+    for f in files:
+        data = f.getvalue()
+        items.append((f.name, data, hashlib.sha256(data).hexdigest()))
+    parts = [h for *_, h in items] + [str(all_sheets), "append" if append else "replace"]
+    digest = hashlib.sha256("|".join(parts).encode()).hexdigest()
+    same = store.version_tag(store.current_version(kind)) == digest[:16]
+    return {"src": src, "files": items, "digest": digest, "parse": not same, "all_sheets": all_sheets}
 
-col1, col2 = st.columns(2)
+def parse_uploads(jobs: dict, usecols=USECOLS):
+    """
+    Nuskaito visų rinkinių visus failus ir lapus VIENU metu. Kiekvienas (failas, lapas) – atskira
+    užduotis: podėlyje esantys imami iš jo (bendras visoms sesijoms, raktas – turinio hash + lapas +
+    stulpelių raidės), likusieji skaitomi lygiagrečiai procesų telkinyje (core.ingest).
+    Lapai sujungiami su kilmės stulpeliais ir deduplikuojami (combine_sources).
+    Papildo jobs[kind] raktais "df", "hit" ir "src_stats".
+    """
+    cache = _parse_cache()
+    frames, todo = {}, {}  # raktas -> DataFrame / (data, lapas, raidės); tas pats lapas skaitomas vieną kartą
+    for job in jobs.values():
+        job["shards"] = []
+        for name, data, digest in job["files"]:
+            names = sheet_names(data)
+            for i in range(len(names) if job["all_sheets"] else min(1, len(names))):
+                key = f"{digest}|{i}|{usecols}"
+                job["shards"].append((key, name, names[i]))
+                if key in frames or key in todo:
+                    continue
+                df = cache.get(key)
+                if df is None:
+                    todo[key] = (data, i, usecols)
+                else:
+                    frames[key] = df
+    if todo:
+        bar = st.progress(0.0, text=f"Skaitoma lapų: {len(todo)}…")
+        def on_progress(done, total):
+            bar.progress(done / total, text=f"Nuskaityta lapų: {done} iš {total}")
+        for key, df in zip(todo, parse_parallel(list(todo.values()), on_progress)):
+            cache.put(key, df)
+            frames[key] = df
+        bar.empty()
+    for job in jobs.values():
+        # combine_sources grąžina naują DataFrame – podėlio lapai nekinta
+        job["df"], job["src_stats"] = combine_sources(
+            [frames[key] for key, *_ in job["shards"]], [(name, sheet) for _, name, sheet in job["shards"]])
+        job["hit"] = not any(key in todo for key, *_ in job["shards"])
 
-with col1:
-    inv_file = st.file_uploader("Sąskaitos.xlsx", type=["xlsx"], key="upl_inv")
-    if inv_file:
-        st.session_state["inv_norm"] = read_by_letters(inv_file)
-        st.success("✅ Sąskaitos nuskaitytos ir įrašytos į session_state['inv_norm'].")
+def _stats_caption(stats: dict):
+    st.caption(" · ".join(f"{k}: {v:,}".replace(",", " ") for k, v in stats.items()))
+
+def load_upload(kind: str, label: str, append: bool, job: dict | None):
+    """
+    Įrašo nuskaitytus failus į bendrą saugyklą (core.store) kaip naują rinkinio versiją.
+    append=True – papildo esamą rinkinį (deduplikacija pagal norm_key_exact(Saskaitos_NR)).
+    job – prepare_upload (+ parse_uploads) rezultatas; None – jau įkelta šioje sesijoje.
+    """
+    if job is None:
+        st.success(f"✅ {label} jau įkeltos (versija `{store.current_version(kind)}`).")
+        return
+    stats = None
+    if not job["parse"]:
+        where = " (toks pat rinkinys jau saugykloje – neskaityta)"
+    else:
+        df, digest = job["df"], job["digest"]
+        old_version = store.current_version(kind)
+        if append:
+            version, stats, delta = store.append(kind, df, tag=digest, ignore_cols=SOURCE_COLS)
+        else:
+            version = store.save(kind, df, tag=digest)
+        if kind == invoice_index.KIND and version != old_version:
+            # Numerių indeksą paruošiam iš karto: papildant – tik iš deltos
+            if append and old_version is not None:
+                invoice_index.update_on_append(old_version, version, delta)
+            invoice_index.get_index(version)
+        where = " (iš podėlio, be pakartotinio skaitymo)" if job["hit"] else ""
+    st.session_state[f"{kind}_src"] = job["src"]
+    n_files = len(job["files"])
+    st.success(f"✅ {label}{f' ({n_files} failai)' if n_files > 1 else ''} nuskaitytos{where} "
+               f"ir įrašytos į saugyklą (versija `{store.current_version(kind)}`).")
+    if job["parse"]:
+        _stats_caption(job["src_stats"])
+    if stats:
+        _stats_caption(stats)
+
+mode = st.radio(
+    "Įkėlimo režimas",
+    options=["Pakeisti visą rinkinį", "Papildyti esamą (tik nauji/pakitę dokumentai)"],
+    horizontal=True,
+    index=0,
+)
+append_mode = mode.startswith("Papildyti")
+all_sheets = st.toggle(
+    "Skaityti visus darbaknygių lapus", value=False,
+    help="Neįjungus – tik pirmas kiekvieno failo lapas (kaip anksčiau). Tas pats dokumentas keliuose failuose/lapuose "
+         "imamas iš paskutinio (failų eilės tvarka).",
+)
 
+col1, col2 = st.columns(2)
+with col1:
+    inv_files = st.file_uploader("Sąskaitos (.xlsx, galima keli failai)", type=["xlsx"], key="upl_inv",
+                                 accept_multiple_files=True)
 with col2:
-    crn_file = st.file_uploader("Kreditinės.xlsx", type=["xlsx"], key="upl_crn")
-    if crn_file:
-        st.session_state["crn_norm"] = read_by_letters(crn_file)
-        st.success("✅ Kreditinės nuskaitytos ir įrašytos į session_state['crn_norm'].")
-
-# Greita peržiūra
-if "inv_norm" in st.session_state:
-    st.subheader("Peržiūra – Sąskaitos")
-    st.dataframe(st.session_state["inv_norm"].head(20), use_container_width=True)
-
-if "crn_norm" in st.session_state:
-    st.subheader("Peržiūra – Kreditinės")
-    st.dataframe(st.session_state["crn_norm"].head(20), use_container_width=True)
+    crn_files = st.file_uploader("Kreditinės (.xlsx, galima keli failai)", type=["xlsx"], key="upl_crn",
+                                 accept_multiple_files=True)
+
+# Visi failai ir lapai skaitomi kartu (lygiagrečiai), tik tada rašomi į saugyklą
+uploads = [(col1, inv_files, "inv_norm", "Sąskaitos"), (col2, crn_files, "crn_norm", "Kreditinės")]
+jobs = {kind: prepare_upload(files, kind, append_mode, all_sheets) for _, files, kind, _ in uploads if files}
+parse_uploads({k: j for k, j in jobs.items() if j is not None and j["parse"]})
+for col, files, kind, label in uploads:
+    if files:
+        with col:
+            load_upload(kind, label, append_mode, jobs[kind])
+
+# Greita peržiūra (iš bendros saugyklos)
+inv_prev, inv_ver = store.load_current("inv_norm")
+if inv_prev is not None:
+    st.subheader(f"Peržiūra – Sąskaitos (versija `{inv_ver}`)")
+    st.dataframe(eur_frame(inv_prev.head(20), ["Suma_su_PVM"]), use_container_width=True)
+
+crn_prev, crn_ver = store.load_current("crn_norm")
+if crn_prev is not None:
+    st.subheader(f"Peržiūra – Kreditinės (versija `{crn_ver}`)")
+    st.dataframe(eur_frame(crn_prev.head(20), ["Suma_su_PVM"]), use_container_width=True)
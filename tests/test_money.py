@@ -0,0 +1,71 @@
+"""
+core.money.to_cents savybių testai: vektorinis nukirpimas iki centų turi sutapti su
+puslapio floor2 (Decimal(str(x)) -> 0.01, ROUND_DOWN) kiekvienai float reikšmei.
+"""
+import math
+from decimal import Decimal, ROUND_DOWN
+
+import numpy as np
+import pandas as pd
+from hypothesis import example, given, strategies as st
+
+from core.money import CENTS_EXACT_MAX, INT64_MAX_EUR, to_cents
+
+def floor2_cents(x: float) -> int:
+    """Etalonas: floor2 (žr. Likučių puslapį) centais."""
+    if not math.isfinite(x):
+        return 0
+    return int(Decimal(str(x)).quantize(Decimal("0.01"), rounding=ROUND_DOWN) * 100)
+
+def cents_of(x: float) -> int:
+    return int(to_cents(pd.Series([x], dtype=float)).iloc[0])
+
+finite = st.floats(allow_nan=False, allow_infinity=False, min_value=-CENTS_EXACT_MAX, max_value=CENTS_EXACT_MAX)
+
+@given(finite)
+@example(0.29)      # 0.29 * 100 = 28.999999999999996
+@example(-0.29)
+@example(1.005)
+@example(-0.0)
+@example(5e-324)
+def test_matches_floor2(x):
+    assert cents_of(x) == floor2_cents(x)
+
+@given(finite)
+def test_symmetric_for_negatives(x):
+    assert cents_of(-x) == -cents_of(x)
+
+@given(st.integers(min_value=-(10**12), max_value=10**12))
+def test_half_cent_and_cent_boundaries(k):
+    # k/100 – tiksli cento riba (kaip ją mato str), (k+0.5)/100 – pusė cento;
+    # gretimi float iš abiejų pusių tikrina ±1 pataisą po daugybos
+    for x in (k / 100, (k + 0.5) / 100):
+        for y in (x, np.nextafter(x, -np.inf), np.nextafter(x, np.inf)):
+            assert cents_of(float(y)) == floor2_cents(float(y))
+
+@given(st.floats(min_value=CENTS_EXACT_MAX, max_value=INT64_MAX_EUR, exclude_max=True))
+def test_large_values_take_decimal_path(x):
+    assert cents_of(x) == floor2_cents(x)
+    assert cents_of(-x) == -floor2_cents(x)
+
+@given(st.floats(min_value=INT64_MAX_EUR, allow_infinity=False))
+def test_int64_overflow_bound_gives_zero(x):
+    assert cents_of(x) == 0
+    assert cents_of(-x) == 0
+
+def test_non_finite_gives_zero():
+    s = to_cents(pd.Series([np.nan, np.inf, -np.inf, 1.5]))
+    assert s.tolist() == [0, 0, 0, 150]
+    assert s.dtype == np.int64
+
+@given(st.lists(finite, max_size=50))
+def test_vector_matches_elementwise(xs):
+    s = pd.Series(xs, dtype=float, index=range(10, 10 + len(xs)), name="Suma")
+    out = to_cents(s)
+    assert out.dtype == np.int64
+    assert out.name == "Suma" and out.index.equals(s.index)
+    assert out.tolist() == [floor2_cents(x) for x in xs]
+
+@given(st.lists(st.integers(min_value=-(10**15), max_value=10**15), max_size=50))
+def test_integer_euros(xs):
+    assert to_cents(pd.Series(xs, dtype="int64")).tolist() == [x * 100 for x in xs]